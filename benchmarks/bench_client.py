@@ -0,0 +1,98 @@
+"""
+    Client microbenchmarks
+    ======================
+
+    Measures the per-call overhead of the Flinks client, excluding the network: requests are
+    answered by a stub transport adapter (or the session is bypassed entirely). Run it using:
+
+        $ python benchmarks/bench_client.py
+
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flinks import Client  # noqa: E402
+
+
+RESPONSE_CONTENT = b'{"Accounts": []}'
+
+
+class StubAdapter(HTTPAdapter):
+    """ Transport adapter answering every request without performing any I/O. """
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = RESPONSE_CONTENT
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        response.request = request
+        response.url = request.url
+        return response
+
+
+class StubResponse:
+    """ Pre-built response returned when the whole requests stack is bypassed. """
+
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'Accounts': []}
+
+
+def _get_benchmarks():
+    client = Client('foo-12345', 'https://username.flinks-custom.io')
+    client.session.mount(client.api_endpoint, StubAdapter())
+    banking_services = client.banking_services
+
+    bare_client = Client('foo-12345', 'https://username.flinks-custom.io')
+    stub_response = StubResponse()
+    bare_client.session.post = bare_client.session.get = lambda *args, **kwargs: stub_response
+    bare_banking_services = bare_client.banking_services
+
+    return [
+        ('build_path (static)', lambda: banking_services._build_path('GetAccountsSummary')),
+        (
+            'build_path (dynamic)',
+            lambda: banking_services._build_path('GetAccountsDetailAsync/' + 'request-1234'),
+        ),
+        (
+            'get_accounts_summary (client only)',
+            lambda: bare_banking_services.get_accounts_summary('request-1234'),
+        ),
+        (
+            'get_accounts_detail_async (client only)',
+            lambda: bare_banking_services.get_accounts_detail_async('request-1234'),
+        ),
+        (
+            'get_accounts_summary (with requests)',
+            lambda: banking_services.get_accounts_summary('request-1234'),
+        ),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument('-n', '--number', type=int, default=2000)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for name, func in _get_benchmarks():
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat)) / args.number
+        print('{:<45} {:>10.2f} us/call'.format(name, best * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+    Transaction merge benchmarks
+    ============================
+
+    Measures the time and the memory needed to index a large transactions history and to fold
+    overlapping account details responses into it. Run it using:
+
+        $ python benchmarks/bench_merge.py --rows 1000000
+
+"""
+
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+import tracemalloc
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flinks.merge import TransactionIndex, merge_accounts_detail  # noqa: E402
+
+
+def _make_response(rows, accounts, offset=0, id_prefix='tx'):
+    start = dt.date(2010, 1, 1)
+    per_account = rows // accounts
+    return {
+        'Accounts': [
+            {
+                'Id': 'acc-{}'.format(a),
+                'Transactions': [
+                    {
+                        'Id': '{}-{}-{}'.format(id_prefix, a, i),
+                        'Date': (start + dt.timedelta(days=i // 5)).isoformat(),
+                        'Debit': (i % 97) + 0.99,
+                        'Credit': None,
+                        'Balance': 1000.0,
+                        'Description': 'Merchant {}'.format(i % 500),
+                    }
+                    for i in range(offset, offset + per_account)
+                ],
+            }
+            for a in range(accounts)
+        ],
+    }
+
+
+def _measure(name, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('{:<50} {:>8.2f} s {:>10.1f} MiB peak'.format(name, elapsed, peak / 2 ** 20))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1].strip())
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--overlap', type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    history = _make_response(args.rows, args.accounts)
+    batch_rows = args.rows // 10
+    per_account = args.rows // args.accounts
+    offset = per_account - int(batch_rows // args.accounts * args.overlap)
+    overlapping = _make_response(batch_rows, args.accounts, offset=offset)
+    renamed = _make_response(batch_rows, args.accounts, offset=offset, id_prefix='renamed')
+
+    index = _measure(
+        'index {} rows'.format(args.rows),
+        lambda: TransactionIndex.from_accounts_detail(history, match_changed_ids=True),
+    )
+    added = _measure(
+        'merge {} rows ({:.0%} overlap)'.format(batch_rows, args.overlap),
+        lambda: merge_accounts_detail(history, overlapping, index),
+    )
+    print('  added {} transactions'.format(added))
+    added = _measure(
+        'merge {} rows (changed IDs)'.format(batch_rows),
+        lambda: merge_accounts_detail(history, renamed, index),
+    )
+    print('  added {} transactions'.format(added))
+
+
+if __name__ == '__main__':
+    main()
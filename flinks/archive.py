@@ -0,0 +1,243 @@
+"""
+    Flinks transaction archives
+    ===========================
+
+    This module defines a compact binary columnar file format allowing to archive the transactions
+    returned by ``BankingServices.get_accounts_detail`` and to read them back through ``mmap``
+    without deserializing anything. Each column is exposed as a zero-copy ``memoryview``:
+
+    * ``dates``: number of days since 1970-01-01 (int32)
+    * ``amounts``: credit minus debit, in cents (int64)
+    * ``balances``: balance after the transaction, in cents (int64; ``MISSING`` if unknown)
+    * ``logins``, ``accounts``, ``transaction_ids``, ``descriptions``, ``categories``: indexes in
+      the interned string table of the archive (uint32; index 0 is the empty string)
+
+    Files are written using the native byte order of the machine producing them.
+
+"""
+
+import datetime as dt
+import mmap
+import struct
+import sys
+from array import array
+
+from .exceptions import ArchiveError
+
+
+MAGIC = b'FLKA'
+VERSION = 1
+MISSING = -2 ** 63
+
+_HEADER = struct.Struct('<4sHHQQQ')
+_BYTE_ORDERS = {'little': 0, 'big': 1}
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+_INT64_COLUMNS = ('amounts', 'balances')
+_INT32_COLUMNS = ('dates', 'logins', 'accounts', 'transaction_ids', 'descriptions', 'categories')
+
+
+def write_archive(path, responses):
+    """ Writes the transactions contained in account details responses to an archive file.
+
+    :param path: path of the archive file to create
+    :param responses: iterable of dictionaries returned by ``get_accounts_detail``
+    :type path: str
+    :type responses: iterable
+    :return: number of archived transactions
+    :rtype: int
+
+    """
+    strings = ['']
+    string_indexes = {'': 0}
+
+    def _intern(value):
+        value = '' if value is None else str(value)
+        index = string_indexes.get(value)
+        if index is None:
+            index = string_indexes[value] = len(strings)
+            strings.append(value)
+        return index
+
+    columns = {name: array('q') for name in _INT64_COLUMNS}
+    columns['dates'] = array('i')
+    columns.update({name: array('I') for name in _INT32_COLUMNS[1:]})
+    for response_data in responses:
+        login = response_data.get('Login') or {}
+        login_index = _intern(login.get('Id'))
+        for account in response_data.get('Accounts') or []:
+            account_index = _intern(account.get('Id'))
+            for transaction in account.get('Transactions') or []:
+                columns['dates'].append(_date_to_days(transaction.get('Date')))
+                columns['amounts'].append(
+                    _to_cents(transaction.get('Credit') or 0) -
+                    _to_cents(transaction.get('Debit') or 0)
+                )
+                balance = transaction.get('Balance')
+                columns['balances'].append(MISSING if balance is None else _to_cents(balance))
+                columns['logins'].append(login_index)
+                columns['accounts'].append(account_index)
+                columns['transaction_ids'].append(_intern(transaction.get('Id')))
+                columns['descriptions'].append(_intern(transaction.get('Description')))
+                columns['categories'].append(_intern(transaction.get('Category')))
+
+    encoded_strings = [value.encode('utf-8') for value in strings]
+    offsets = array('Q', [0])
+    for value in encoded_strings:
+        offsets.append(offsets[-1] + len(value))
+
+    count = len(columns['dates'])
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(
+            MAGIC, VERSION, _BYTE_ORDERS[sys.byteorder], count, len(strings), offsets[-1],
+        ))
+        for name in _INT64_COLUMNS + _INT32_COLUMNS:
+            _write_aligned(f, columns[name].tobytes())
+        _write_aligned(f, offsets.tobytes())
+        f.write(b''.join(encoded_strings))
+    return count
+
+
+class TransactionArchive:
+    """ Gives access to the columns of an archive file through a memory map. """
+
+    def __init__(self, path):
+        """ Opens the archive file located at the given path.
+
+        :param path: path of the archive file
+        :type path: str
+
+        """
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ArchiveError('Empty transaction archive: {}'.format(path))
+        self._view = memoryview(self._mmap)
+        self._views = []
+
+        try:
+            magic, version, byte_order, count, string_count, blob_size = _HEADER.unpack_from(
+                self._mmap,
+            )
+        except struct.error:
+            self.close()
+            raise ArchiveError('Truncated transaction archive: {}'.format(path))
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ArchiveError('Unsupported transaction archive: {}'.format(path))
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            self.close()
+            raise ArchiveError('Transaction archive uses a different byte order: {}'.format(path))
+
+        expected_size = (
+            _HEADER.size + len(_INT64_COLUMNS) * _padded(count * 8) +
+            len(_INT32_COLUMNS) * _padded(count * 4) + _padded((string_count + 1) * 8) + blob_size
+        )
+        if len(self._mmap) < expected_size:
+            self.close()
+            raise ArchiveError('Truncated transaction archive: {}'.format(path))
+
+        self._count = count
+        self._string_count = string_count
+        offset = _HEADER.size
+        for name in _INT64_COLUMNS + _INT32_COLUMNS:
+            fmt = 'q' if name in _INT64_COLUMNS else ('i' if name == 'dates' else 'I')
+            size = count * struct.calcsize(fmt)
+            setattr(self, name, self._cast(offset, size, fmt))
+            offset += _padded(size)
+        offsets_size = (string_count + 1) * 8
+        self._string_offsets = self._cast(offset, offsets_size, 'Q')
+        offset += _padded(offsets_size)
+        self._strings = self._view[offset:offset + blob_size]
+        self._string_cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """ Yields each archived transaction as a dictionary (this is not the fast path). """
+        for i in range(self._count):
+            balance = self.balances[i]
+            yield {
+                'LoginId': self.string(self.logins[i]),
+                'AccountId': self.string(self.accounts[i]),
+                'Id': self.string(self.transaction_ids[i]),
+                'Date': self.date(i),
+                'Amount': self.amounts[i] / 100,
+                'Balance': None if balance == MISSING else balance / 100,
+                'Description': self.string(self.descriptions[i]),
+                'Category': self.string(self.categories[i]),
+            }
+
+    def date(self, i):
+        """ Returns the date of the i-th transaction. """
+        return dt.date.fromordinal(self.dates[i] + _EPOCH_ORDINAL)
+
+    def string(self, index):
+        """ Returns the string stored at the given index of the string table. """
+        value = self._string_cache.get(index)
+        if value is None:
+            if not 0 <= index < self._string_count:
+                raise IndexError('string index out of range')
+            start, end = self._string_offsets[index], self._string_offsets[index + 1]
+            value = self._string_cache[index] = bytes(self._strings[start:end]).decode('utf-8')
+        return value
+
+    def close(self):
+        """ Releases the views and the memory map of the archive.
+
+        Slices of the columns (or objects using their buffers, eg. ``numpy.frombuffer`` arrays)
+        that are still alive keep the memory map open: it is only unmapped once they are garbage
+        collected, so they should be dropped before closing the archive in order to free the
+        memory map immediately.
+
+        """
+        views = self._views + [getattr(self, '_strings', None), self._view]
+        self._views = []
+        self._strings = None
+        for view in views:
+            if view is not None:
+                _release(view.release)
+        _release(self._mmap.close)
+
+    def _cast(self, offset, size, fmt):
+        view = self._view[offset:offset + size].cast(fmt)
+        self._views.append(view)
+        return view
+
+
+def _date_to_days(value):
+    if not value:
+        return 0
+    if isinstance(value, dt.datetime):
+        value = value.date()
+    if not isinstance(value, dt.date):
+        value = dt.datetime.strptime(value[:10].replace('/', '-'), '%Y-%m-%d').date()
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def _to_cents(value):
+    return int(round(float(value) * 100))
+
+
+def _release(release):
+    """ Calls a release function, ignoring the errors caused by buffers that are still exported. """
+    try:
+        release()
+    except BufferError:
+        pass
+
+
+def _padded(size):
+    return (size + 7) & ~7
+
+
+def _write_aligned(f, data):
+    f.write(data)
+    f.write(b'\0' * (_padded(len(data)) - len(data)))
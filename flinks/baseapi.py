@@ -6,8 +6,6 @@
 
 """
 
-from itertools import chain
-
 
 class BaseApi:
     """ Simple class to buid path for entities. """
@@ -19,4 +17,6 @@ class BaseApi:
 
     def _build_path(self, *args):
         """ Builds a path using the configured endpoint and path arguments. """
-        return '/'.join(chain((self.endpoint, ), map(str, args)))
+        if len(args) == 1 and isinstance(args[0], str):
+            return self.endpoint + '/' + args[0]
+        return '/'.join([self.endpoint] + [str(arg) for arg in args])
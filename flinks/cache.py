@@ -0,0 +1,204 @@
+"""
+    Flinks RequestId caches
+    =======================
+
+    This module defines caches allowing to reuse the response of a previous ``authorize`` call
+    performed for a given LoginId (and thus its RequestId) while that RequestId is still valid.
+    Caches can be kept in memory (``MemoryRequestIdCache``) or shared between processes through a
+    local SQLite database (``SqliteRequestIdCache``). Only the fields needed to use the RequestId
+    (``RequestId``, ``Login.Id`` and ``HttpStatusCode``) are cached; other details of the user (eg.
+    its username) are never stored. The client removes a cached RequestId as soon as a call using it
+    is rejected by the Flinks service (eg. because the related session expired).
+
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from .sqlite import connect
+
+
+DEFAULT_TTL = 25 * 60
+
+
+class BaseRequestIdCache(ABC):
+    """ Base class of the caches mapping LoginIds to authorization responses. """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=None):
+        """ Initializes the cache.
+
+        :param ttl:
+            number of seconds during which an authorization response can be reused; this should be
+            lower than the lifetime of the RequestIds generated by the Flinks service
+        :param clock: callable returning the current time in seconds
+        :type ttl: int or float
+        :type clock: callable
+
+        """
+        self.ttl = ttl
+        self.clock = clock or time.time
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, login_id):
+        """ Returns the authorization response cached for the given LoginId (if any). """
+        response_data = self._get(login_id, self.clock())
+        if response_data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response_data
+
+    def set(self, login_id, response_data):
+        """ Caches the authorization response associated with the given LoginId. """
+        self._set(login_id, _get_cached_fields(response_data), self.clock() + self.ttl)
+
+    @abstractmethod
+    def delete(self, login_id):
+        """ Removes the authorization response cached for the given LoginId. """
+
+    @abstractmethod
+    def delete_request_id(self, request_id):
+        """ Removes the authorization response whose RequestId is the given one (if any). """
+
+    @abstractmethod
+    def clear(self):
+        """ Removes all the cached authorization responses. """
+
+    @abstractmethod
+    def _get(self, login_id, now):
+        """ Returns the authorization response cached for the LoginId if it did not expire. """
+
+    @abstractmethod
+    def _set(self, login_id, response_data, expires_at):
+        """ Caches the authorization response associated with the LoginId until it expires. """
+
+
+class MemoryRequestIdCache(BaseRequestIdCache):
+    """ Keeps authorization responses in the memory of the current process. """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=None):
+        super().__init__(ttl=ttl, clock=clock)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0
+
+    def delete(self, login_id):
+        with self._lock:
+            self._entries.pop(login_id, None)
+
+    def delete_request_id(self, request_id):
+        with self._lock:
+            for login_id, entry in list(self._entries.items()):
+                if entry[0]['RequestId'] == request_id:
+                    del self._entries[login_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, login_id, now):
+        with self._lock:
+            entry = self._entries.get(login_id)
+            if entry is None:
+                return None
+            elif entry[1] <= now:
+                del self._entries[login_id]
+                return None
+            return entry[0]
+
+    def _set(self, login_id, response_data, expires_at):
+        with self._lock:
+            # Expired entries are periodically purged so that the cache does not grow indefinitely.
+            now = self.clock()
+            if now >= self._next_purge:
+                for expired_login_id in [k for k, v in self._entries.items() if v[1] <= now]:
+                    del self._entries[expired_login_id]
+                self._next_purge = now + self.ttl
+            self._entries[login_id] = (response_data, expires_at)
+
+
+class SqliteRequestIdCache(BaseRequestIdCache):
+    """ Keeps authorization responses in a SQLite database that can be shared between processes. """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, clock=None, timeout=5):
+        """ Initializes the cache.
+
+        :param path: path of the SQLite database file
+        :param timeout: number of seconds to wait for the database lock
+        :type path: str
+        :type timeout: int or float
+
+        """
+        super().__init__(ttl=ttl, clock=clock)
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as connection:
+            # Previous versions of the cache stored whole authorization responses.
+            connection.execute('DROP TABLE IF EXISTS flinks_request_ids')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS flinks_authorizations ('
+                'login_id TEXT PRIMARY KEY, request_id TEXT NOT NULL, authorized_login_id TEXT, '
+                'http_status_code INTEGER, expires_at REAL NOT NULL)'
+            )
+
+    def delete(self, login_id):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM flinks_authorizations WHERE login_id = ?', (login_id, ))
+
+    def delete_request_id(self, request_id):
+        with self._connect() as connection:
+            connection.execute(
+                'DELETE FROM flinks_authorizations WHERE request_id = ?', (request_id, ),
+            )
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM flinks_authorizations')
+
+    def _get(self, login_id, now):
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT request_id, authorized_login_id, http_status_code '
+                'FROM flinks_authorizations WHERE login_id = ? AND expires_at > ?',
+                (login_id, now),
+            ).fetchone()
+        if row is None:
+            return None
+        response_data = {'RequestId': row[0]}
+        if row[1] is not None:
+            response_data['Login'] = {'Id': row[1]}
+        if row[2] is not None:
+            response_data['HttpStatusCode'] = row[2]
+        return response_data
+
+    def _set(self, login_id, response_data, expires_at):
+        with self._connect() as connection:
+            connection.execute(
+                'DELETE FROM flinks_authorizations WHERE expires_at <= ?', (self.clock(), ),
+            )
+            connection.execute(
+                'INSERT OR REPLACE INTO flinks_authorizations '
+                '(login_id, request_id, authorized_login_id, http_status_code, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (
+                    login_id, response_data['RequestId'],
+                    response_data.get('Login', {}).get('Id'),
+                    response_data.get('HttpStatusCode'), expires_at,
+                ),
+            )
+
+    def _connect(self):
+        return connect(self.path, timeout=self.timeout)
+
+
+def _get_cached_fields(response_data):
+    """ Returns the fields of an authorization response that can be cached. """
+    cached = {'RequestId': response_data['RequestId']}
+    login = response_data.get('Login')
+    if isinstance(login, dict) and login.get('Id') is not None:
+        cached['Login'] = {'Id': login['Id']}
+    if response_data.get('HttpStatusCode') is not None:
+        cached['HttpStatusCode'] = response_data['HttpStatusCode']
+    return cached
@@ -0,0 +1,177 @@
+"""
+    Flinks change detection
+    =======================
+
+    This module defines the ``ChangeDetector`` class allowing to skip expensive
+    ``get_accounts_detail`` calls when nothing changed for a user. The cheap
+    ``get_accounts_summary`` response is fingerprinted (accounts, balances and last transaction
+    markers) along with the options of the detail call, and the fingerprint is compared with the
+    one stored for the LoginId during the previous refresh. Fingerprints can be kept in memory
+    (``MemoryFingerprintStore``) or in a local SQLite database (``SqliteFingerprintStore``).
+
+"""
+
+import hashlib
+import json
+import threading
+
+from .sqlite import connect
+
+
+FINGERPRINT_FIELDS = (
+    'Id', 'Balance', 'Category', 'Type', 'Currency', 'AccountNumber', 'TransitNumber',
+    'LastTransactionId', 'LastTransactionDate',
+)
+
+
+def fingerprint(summary):
+    """ Returns a fingerprint of the relevant parts of an accounts summary response.
+
+    :param summary: dictionary returned by ``get_accounts_summary``
+    :type summary: dict
+    :return: hexadecimal fingerprint
+    :rtype: str
+
+    """
+    accounts = []
+    for account in summary.get('Accounts') or []:
+        relevant = {name: account[name] for name in FINGERPRINT_FIELDS if name in account}
+        transactions = account.get('Transactions')
+        if transactions:
+            relevant['Transactions'] = [len(transactions), transactions[-1].get('Id')]
+        accounts.append(relevant)
+    accounts.sort(key=lambda account: str(account.get('Id')))
+    payload = json.dumps(accounts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ChangeDetector:
+    """ Fetches account details only when the accounts summary of a user changed. """
+
+    def __init__(self, client, store=None):
+        """ Initializes the change detector.
+
+        :param client: Flinks client used to perform the calls
+        :param store: store of the fingerprints (an in-memory store is used if not provided)
+        :type client: flinks.client.Client
+        :type store: flinks.changes.MemoryFingerprintStore or flinks.changes.SqliteFingerprintStore
+
+        """
+        self.client = client
+        self.store = store if store is not None else MemoryFingerprintStore()
+        self.fetched = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def avoided_ratio(self):
+        """ Returns the fraction of detail calls that were avoided. """
+        total = self.fetched + self.skipped
+        return self.skipped / total if total else 0
+
+    def refresh(self, login_id, request_id, force=False, **detail_kwargs):
+        """ Returns the account details of a user, or ``None`` if nothing changed.
+
+        :param login_id: login ID of the user (used to store the fingerprints)
+        :param request_id: valid request ID
+        :param force: whether to fetch the account details even if the summary did not change
+        :param detail_kwargs:
+            keyword arguments passed to ``get_accounts_detail`` (eg. ``with_transactions`` or
+            ``refresh_delta`` in order to perform a delta fetch); these are part of the stored
+            fingerprint so that a refresh using other options is not skipped
+        :type login_id: str
+        :type request_id: str
+        :type force: bool
+        :return: dictionary containing the complete details of the user (or ``None``)
+        :rtype: dictionary
+
+        """
+        banking_services = self.client.banking_services
+        summary_fingerprint = fingerprint(banking_services.get_accounts_summary(request_id))
+        if detail_kwargs:
+            payload = json.dumps(detail_kwargs, sort_keys=True, separators=(',', ':'), default=str)
+            summary_fingerprint = hashlib.sha256(
+                (summary_fingerprint + payload).encode('utf-8'),
+            ).hexdigest()
+        if not force and self.store.get(login_id) == summary_fingerprint:
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        response_data = banking_services.get_accounts_detail(request_id, **detail_kwargs)
+        # The fingerprint is only stored once the details were retrieved so that a failed fetch
+        # is performed again during the next refresh.
+        self.store.set(login_id, summary_fingerprint)
+        with self._lock:
+            self.fetched += 1
+        return response_data
+
+    def stats(self):
+        """ Returns a dictionary containing the number of fetched and skipped detail calls. """
+        return {
+            'fetched': self.fetched, 'skipped': self.skipped, 'avoided_ratio': self.avoided_ratio,
+        }
+
+
+class MemoryFingerprintStore:
+    """ Keeps fingerprints in the memory of the current process. """
+
+    def __init__(self):
+        self._fingerprints = {}
+
+    def get(self, login_id):
+        """ Returns the fingerprint stored for the given LoginId (if any). """
+        return self._fingerprints.get(login_id)
+
+    def set(self, login_id, value):
+        """ Stores the fingerprint associated with the given LoginId. """
+        self._fingerprints[login_id] = value
+
+    def delete(self, login_id):
+        """ Removes the fingerprint stored for the given LoginId. """
+        self._fingerprints.pop(login_id, None)
+
+
+class SqliteFingerprintStore:
+    """ Keeps fingerprints in a SQLite database that can be shared between processes. """
+
+    def __init__(self, path, timeout=5):
+        """ Initializes the store.
+
+        :param path: path of the SQLite database file
+        :param timeout: number of seconds to wait for the database lock
+        :type path: str
+        :type timeout: int or float
+
+        """
+        self.path = path
+        self.timeout = timeout
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS flinks_fingerprints ('
+                'login_id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)'
+            )
+
+    def get(self, login_id):
+        """ Returns the fingerprint stored for the given LoginId (if any). """
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT fingerprint FROM flinks_fingerprints WHERE login_id = ?', (login_id, ),
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def set(self, login_id, value):
+        """ Stores the fingerprint associated with the given LoginId. """
+        with self._connect() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO flinks_fingerprints (login_id, fingerprint) VALUES (?, ?)',
+                (login_id, value),
+            )
+
+    def delete(self, login_id):
+        """ Removes the fingerprint stored for the given LoginId. """
+        with self._connect() as connection:
+            connection.execute('DELETE FROM flinks_fingerprints WHERE login_id = ?', (login_id, ))
+
+    def _connect(self):
+        return connect(self.path, timeout=self.timeout)
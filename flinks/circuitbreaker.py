@@ -0,0 +1,228 @@
+"""
+    Flinks circuit breakers
+    =======================
+
+    This module defines the ``CircuitBreaker`` and ``CircuitBreakerRegistry`` classes allowing to
+    stop calling API endpoints or financial institutions that are known to be failing. Breakers are
+    kept per endpoint (eg. "BankingServices/GetAccountsDetail") and per institution (eg.
+    "FlinksCapital") so that a failing bank does not tie up workers serving healthy ones.
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from .exceptions import CircuitOpenError
+
+
+class CircuitBreaker:
+    """ Tracks the failures of a single target and decides whether it can be called. """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(
+        self, failure_threshold=5, recovery_timeout=30, half_open_max_calls=1, clock=None,
+    ):
+        """ Initializes the circuit breaker.
+
+        :param failure_threshold: number of consecutive failures that will open the circuit
+        :param recovery_timeout: number of seconds to wait before probing an open circuit again
+        :param half_open_max_calls: number of concurrent probe calls allowed in half-open state
+        :param clock: callable returning the current time in seconds (defaults to a monotonic clock)
+        :type failure_threshold: int
+        :type recovery_timeout: int or float
+        :type half_open_max_calls: int
+        :type clock: callable
+
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+
+    @property
+    def state(self):
+        """ Returns the current state of the circuit. """
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def failures(self):
+        """ Returns the number of consecutive failures recorded so far. """
+        return self._failures
+
+    def allow_request(self):
+        """ Returns a boolean indicating whether a call to the target can be performed. """
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            elif state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def release(self):
+        """ Gives back a probe slot that was granted but not used to perform a call. """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self):
+        """ Records a successful call; this closes the circuit. """
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probes = 0
+
+    def record_failure(self):
+        """ Records a failed call; this may open the circuit. """
+        with self._lock:
+            state = self._current_state()
+            self._failures += 1
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probes = 0
+
+    def reset(self):
+        """ Forces the circuit to be closed. """
+        self.record_success()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+
+class CircuitBreakerRegistry:
+    """ Holds the circuit breakers associated with the endpoints and institutions of a client. """
+
+    ENDPOINT = 'endpoint'
+    INSTITUTION = 'institution'
+
+    def __init__(
+        self, failure_threshold=5, recovery_timeout=30, half_open_max_calls=1, clock=None,
+        max_known_requests=10000,
+    ):
+        """ Initializes the registry; breaker settings are applied to every created breaker.
+
+        :param max_known_requests:
+            maximum number of RequestId/LoginId values whose institution is remembered in order to
+            associate subsequent calls (eg. ``get_accounts_detail``) with an institution
+        :type max_known_requests: int
+
+        """
+        self._breaker_kwargs = {
+            'failure_threshold': failure_threshold,
+            'recovery_timeout': recovery_timeout,
+            'half_open_max_calls': half_open_max_calls,
+            'clock': clock,
+        }
+        self.max_known_requests = max_known_requests
+        self._breakers = {}
+        self._institutions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind, name):
+        """ Returns the circuit breaker associated with the considered endpoint or institution.
+
+        :param kind: either ``ENDPOINT`` or ``INSTITUTION``
+        :param name: name of the endpoint or of the institution
+        :type kind: str
+        :type name: str
+        :return: :class:`CircuitBreaker <CircuitBreaker>` object
+        :rtype: flinks.circuitbreaker.CircuitBreaker
+
+        """
+        with self._lock:
+            breaker = self._breakers.get((kind, name))
+            if breaker is None:
+                breaker = self._breakers[(kind, name)] = CircuitBreaker(**self._breaker_kwargs)
+            return breaker
+
+    def states(self):
+        """ Returns a dictionary of the form ``{(kind, name): state}`` for all known breakers. """
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {key: breaker.state for key, breaker in breakers}
+
+    def reset(self):
+        """ Closes all the known circuits. """
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
+
+    def remember_institution(self, identifier, institution):
+        """ Associates a RequestId or a LoginId with an institution. """
+        if not identifier or not institution:
+            return
+        with self._lock:
+            self._institutions[identifier] = institution
+            self._institutions.move_to_end(identifier)
+            while len(self._institutions) > self.max_known_requests:
+                self._institutions.popitem(last=False)
+
+    def keys_for(self, path, data=None):
+        """ Returns the breaker keys that apply to a call to the given path with the given data. """
+        keys = [(self.ENDPOINT, '/'.join(path.split('/')[:2])), ]
+        data = data or {}
+        institution = data.get('Institution')
+        if institution is None:
+            with self._lock:
+                for identifier in (data.get('RequestId'), data.get('LoginId'), path.split('/')[-1]):
+                    institution = self._institutions.get(identifier)
+                    if institution is not None:
+                        break
+        if institution is not None:
+            keys.append((self.INSTITUTION, institution))
+        return keys
+
+    def before_call(self, keys):
+        """ Raises a ``CircuitOpenError`` if one of the circuits related to the keys is open. """
+        granted = []
+        for kind, name in keys:
+            breaker = self.get(kind, name)
+            if not breaker.allow_request():
+                for granted_breaker in granted:
+                    granted_breaker.release()
+                raise CircuitOpenError(
+                    'Circuit is open for {} "{}"'.format(kind, name), kind=kind, name=name,
+                )
+            granted.append(breaker)
+
+    def record(self, keys, success):
+        """ Records the outcome of a call for the circuits associated with the keys.
+
+        Failures of calls that can be attributed to an institution are only recorded against the
+        breaker of this institution so that a failing bank does not open the circuit of the
+        endpoint for the healthy ones; the breakers of the endpoints only count failures that
+        cannot be attributed to an institution.
+
+        """
+        failed_keys = [key for key in keys if key[0] == self.INSTITUTION] or keys
+        for key in keys:
+            breaker = self.get(*key)
+            if success:
+                breaker.record_success()
+            elif key in failed_keys:
+                breaker.record_failure()
+            else:
+                # The probe slot granted by a breaker whose failure is not recorded is given back.
+                breaker.release()
+
+    def release(self, keys):
+        """ Gives back the probe slots granted for a call whose outcome cannot be recorded. """
+        for kind, name in keys:
+            self.get(kind, name).release()
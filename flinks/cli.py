@@ -0,0 +1,239 @@
+"""
+    Flinks command-line interface
+    =============================
+
+    This module defines the ``python -m flinks`` command allowing to export the account details
+    (and transactions) of many users. LoginIds (or RequestIds) are read from a file or from the
+    standard input, processed concurrently and written as NDJSON or as transaction archive parts
+    (see ``flinks.archive``). Processed identifiers can be recorded in a checkpoint file in order to
+    resume an interrupted export.
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from requests.exceptions import RequestException
+
+from .archive import write_archive
+from .client import Client
+from .exceptions import FlinksError
+
+
+def main(argv=None):
+    """ Runs the export command; returns the exit status of the command. """
+    args = _get_parser().parse_args(argv)
+    customer_id = args.customer_id or os.environ.get('FLINKS_CUSTOMER_ID')
+    if not customer_id:
+        sys.stderr.write('A customer ID must be provided (--customer-id or FLINKS_CUSTOMER_ID)\n')
+        return 2
+    if args.format == 'archive' and args.output == '-':
+        sys.stderr.write('An output directory must be provided (--output) for archives\n')
+        return 2
+
+    # Each worker thread needs its own pooled connection; otherwise connections are discarded and
+    # established again for most of the calls.
+    client = Client(customer_id, base_url=args.base_url, http_pool_size=args.parallelism)
+    done = _read_checkpoint(args.checkpoint)
+    input_file = sys.stdin if args.input == '-' else open(args.input)
+    checkpoint = open(args.checkpoint, 'a') if args.checkpoint else None
+    if args.format == 'ndjson':
+        writer = NdjsonWriter(args.output, append=bool(done))
+    else:
+        writer = ArchiveWriter(args.output, batch_size=args.batch_size)
+
+    exporter = Exporter(
+        client, writer, checkpoint=checkpoint, parallelism=args.parallelism,
+        input_type=args.input_type, with_account_identity=args.with_account_identity,
+        days_of_transactions=args.days_of_transactions, progress_interval=args.progress_interval,
+    )
+    try:
+        identifiers = (line.strip() for line in input_file)
+        exporter.run(i for i in identifiers if i and i not in done)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if checkpoint is not None:
+            checkpoint.close()
+    exporter.report(final=True)
+    return 1 if exporter.failed else 0
+
+
+class Exporter:
+    """ Runs the authorize -> get_accounts_detail pipeline for many identifiers concurrently. """
+
+    def __init__(
+        self, client, writer, checkpoint=None, parallelism=8, input_type='login',
+        with_account_identity=False, days_of_transactions=None, progress_interval=10,
+        stream=None, clock=None,
+    ):
+        self.client = client
+        self.writer = writer
+        self.checkpoint = checkpoint
+        self.parallelism = parallelism
+        self.input_type = input_type
+        self.with_account_identity = with_account_identity
+        self.days_of_transactions = days_of_transactions
+        self.progress_interval = progress_interval
+        self.stream = stream or sys.stderr
+        self.clock = clock or time.monotonic
+        self.succeeded = 0
+        self.failed = 0
+        self.transactions = 0
+        self._started_at = self.clock()
+        self._last_report = self._started_at
+
+    def run(self, identifiers):
+        """ Exports the data associated with the given identifiers. """
+        with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
+            pending = {}
+            for identifier in identifiers:
+                pending[executor.submit(self.export, identifier)] = identifier
+                # Bounds the number of pending identifiers so that the input is read in a streaming
+                # way.
+                if len(pending) >= self.parallelism * 2:
+                    self._collect(pending, FIRST_COMPLETED)
+            self._collect(pending)
+        self._mark_done(self.writer.close())
+
+    def export(self, identifier):
+        """ Retrieves the account details associated with a LoginId or a RequestId. """
+        banking_services = self.client.banking_services
+        request_id = identifier
+        if self.input_type == 'login':
+            authorization = banking_services.authorize(login_id=identifier, most_recent_cached=True)
+            request_id = authorization.get('RequestId')
+            if not request_id or authorization.get('HttpStatusCode', 200) != 200:
+                raise FlinksError('Unable to authorize LoginId {}'.format(identifier))
+        response_data = banking_services.get_accounts_detail(
+            request_id, with_account_identity=self.with_account_identity, with_transactions=True,
+            days_of_transactions=self.days_of_transactions,
+        )
+        if self.input_type == 'login' and not response_data.get('Login'):
+            response_data['Login'] = {'Id': identifier}
+        return response_data
+
+    def report(self, final=False):
+        """ Writes throughput statistics to the progress stream. """
+        elapsed = max(self.clock() - self._started_at, 1e-9)
+        self.stream.write(
+            '{}processed={} failed={} transactions={} rate={:.1f}/s elapsed={:.0f}s\n'.format(
+                'done: ' if final else '', self.succeeded, self.failed, self.transactions,
+                (self.succeeded + self.failed) / elapsed, elapsed,
+            )
+        )
+        self.stream.flush()
+
+    def _collect(self, pending, return_when=ALL_COMPLETED):
+        done, _ = wait(list(pending), return_when=return_when)
+        for future in done:
+            identifier = pending.pop(future)
+            try:
+                response_data = future.result()
+            except (FlinksError, RequestException) as e:
+                self.failed += 1
+                self.stream.write('error: {}: {}\n'.format(identifier, e))
+                continue
+            self.succeeded += 1
+            self.transactions += sum(
+                len(account.get('Transactions') or [])
+                for account in response_data.get('Accounts') or []
+            )
+            self._mark_done(self.writer.write(identifier, response_data))
+
+        if self.progress_interval and self.clock() - self._last_report >= self.progress_interval:
+            self._last_report = self.clock()
+            self.report()
+
+    def _mark_done(self, identifiers):
+        if self.checkpoint is None or not identifiers:
+            return
+        self.checkpoint.write(''.join(identifier + '\n' for identifier in identifiers))
+        self.checkpoint.flush()
+
+
+class NdjsonWriter:
+    """ Writes one JSON document per line for each exported identifier. """
+
+    def __init__(self, path, append=False):
+        self._file = sys.stdout if path == '-' else open(path, 'a' if append else 'w')
+
+    def write(self, identifier, response_data):
+        """ Writes a record; returns the identifiers whose records are written. """
+        self._file.write(json.dumps({'Id': identifier, 'Response': response_data}) + '\n')
+        self._file.flush()
+        return [identifier]
+
+    def close(self):
+        """ Closes the underlying file; returns the identifiers whose records were written. """
+        if self._file is not sys.stdout:
+            self._file.close()
+        return []
+
+
+class ArchiveWriter:
+    """ Writes transaction archive parts (part-00000.flka, ...) to a directory. """
+
+    def __init__(self, directory, batch_size=1000):
+        self.directory = directory
+        self.batch_size = batch_size
+        os.makedirs(directory, exist_ok=True)
+        self._part = len([n for n in os.listdir(directory) if n.endswith('.flka')])
+        self._identifiers = []
+        self._responses = []
+
+    def write(self, identifier, response_data):
+        """ Buffers a record; returns the identifiers whose records are written. """
+        self._identifiers.append(identifier)
+        self._responses.append(response_data)
+        if len(self._responses) >= self.batch_size:
+            return self._flush()
+        return []
+
+    def close(self):
+        """ Writes the buffered records; returns the related identifiers. """
+        return self._flush()
+
+    def _flush(self):
+        if not self._responses:
+            return []
+        path = os.path.join(self.directory, 'part-{:05d}.flka'.format(self._part))
+        write_archive(path + '.tmp', self._responses)
+        os.replace(path + '.tmp', path)
+        self._part += 1
+        identifiers, self._identifiers, self._responses = self._identifiers, [], []
+        return identifiers
+
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def _get_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m flinks',
+        description='Exports the account details and transactions of many Flinks users.',
+    )
+    parser.add_argument(
+        'input', nargs='?', default='-',
+        help='file containing one LoginId (or RequestId) per line ("-" for stdin)',
+    )
+    parser.add_argument('-o', '--output', default='-', help='output file or directory')
+    parser.add_argument('--format', choices=('ndjson', 'archive'), default='ndjson')
+    parser.add_argument('--input-type', choices=('login', 'request'), default='login')
+    parser.add_argument('--customer-id', help='Flinks customer ID')
+    parser.add_argument('--base-url', help='base URL of the Flinks API')
+    parser.add_argument('-j', '--parallelism', type=int, default=8)
+    parser.add_argument('--checkpoint', help='file used to record the processed identifiers')
+    parser.add_argument('--batch-size', type=int, default=1000, help='records per archive part')
+    parser.add_argument('--with-account-identity', action='store_true')
+    parser.add_argument('--days-of-transactions', choices=('Days90', 'Days365'))
+    parser.add_argument('--progress-interval', type=float, default=10)
+    return parser
@@ -8,38 +8,99 @@
 
 """
 
+import functools
+import threading
+from contextlib import contextmanager
 from urllib.parse import urljoin
 
-import requests
 from requests.adapters import HTTPAdapter
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, RequestException
 
 from .exceptions import ProtocolError, TransportError
+from .session import Session
+
+
+DEFAULT_HEADERS = {'cache-control': 'no-cache', 'Content-Type': 'application/json'}
+
+_SESSION_METHODS = {
+    'DELETE': 'delete', 'GET': 'get', 'PATCH': 'patch', 'POST': 'post', 'PUT': 'put',
+}
 
 
 class Client:
-    """ The Flinks API client class. """
+    """ The Flinks API client class.
+
+    A single client can be shared by many threads. By default, all the threads use the same HTTP
+    session; ``thread_local_sessions=True`` can be used in order to give each thread its own session
+    (and thus its own cookies and settings) while still sharing the same connection pool. The
+    ``session_hook`` callable is called with every session created by the client and can be used in
+    order to configure them (eg. proxies or TLS settings).
+
+    """
 
-    def __init__(self, customer_id, base_url=None, http_max_retries=None):
+    def __init__(
+        self, customer_id, base_url=None, http_max_retries=None, circuit_breakers=None,
+        scheduler=None, request_id_cache=None, hedging=None, profiler=None,
+        http_pool_size=None, thread_local_sessions=False, session_hook=None,
+    ):
         """ Initializes the Flinks client.
 
         :param customer_id: authorization key required to interact with the API endpoints
         :param base_url: base URL of the API endpont (eg. "https://sandbox.flinks.io/v3/")
         :param http_max_retries: maximum number of retries each connection should attempt
+        :param circuit_breakers:
+            registry of circuit breakers used to fail fast when calling endpoints or institutions
+            that are known to be failing (circuit breaking is disabled if not provided)
+        :param scheduler:
+            scheduler used to admit calls according to their priority and deadline (calls are
+            performed as soon as they are issued if not provided)
+        :param request_id_cache:
+            cache used to reuse the RequestIds generated for LoginIds when authorizing with
+            ``most_recent_cached=True`` (RequestIds are not reused if not provided)
+        :param hedging:
+            policy used to send duplicate requests for slow calls to idempotent read endpoints
+            (calls are never hedged if not provided)
+        :param profiler:
+            profiler used to record per-endpoint CPU, wall time and memory statistics (calls are
+            not profiled if not provided)
+        :param http_pool_size:
+            maximum number of connections to keep in the connection pool (this should be at least
+            the number of threads sharing the client)
+        :param thread_local_sessions: whether each thread should use its own HTTP session
+        :param session_hook: callable called with each HTTP session created by the client
         :type customer_id: str
         :type base_url: str
         :type http_max_retries: int
+        :type circuit_breakers: flinks.circuitbreaker.CircuitBreakerRegistry
+        :type scheduler: flinks.scheduler.RequestScheduler
+        :type request_id_cache: flinks.cache.BaseRequestIdCache
+        :type hedging: flinks.hedging.HedgingPolicy
+        :type profiler: flinks.profiling.Profiler
+        :type http_pool_size: int
+        :type thread_local_sessions: bool
+        :type session_hook: callable
         :return: :class:`Client <Client>` object
         :rtype: flinks.client.Client
 
         """
         # Initializes attributes related to the client settings.
         self.api_endpoint = urljoin(base_url or 'https://sandbox.flinks.io/v3/', customer_id) + '/'
-        self.session = requests.Session()
-        self.session.mount(self.api_endpoint, HTTPAdapter(max_retries=http_max_retries or 3))
+        self.thread_local_sessions = thread_local_sessions
+        self.session_hook = session_hook
+        self._adapter = HTTPAdapter(
+            max_retries=http_max_retries or 3, pool_maxsize=http_pool_size or 10,
+        )
+        self._local = threading.local()
+        self._session = None if thread_local_sessions else self._create_session()
+        self.circuit_breakers = circuit_breakers
+        self.scheduler = scheduler
+        self.request_id_cache = request_id_cache
+        self.hedging = hedging
+        self.profiler = profiler
 
         # Set up entities attributes.
         self._banking_services = None
+        self._entities_lock = threading.Lock()
 
         ###################
         # FLINKS ENTITIES #
@@ -55,25 +116,172 @@ class Client:
         """
         if self._banking_services is None:
             from .entities.banking_services import BankingServices
-            self._banking_services = BankingServices(self)
+            with self._entities_lock:
+                if self._banking_services is None:
+                    self._banking_services = BankingServices(self)
         return self._banking_services
 
+    @property
+    def session(self):
+        """ Returns the HTTP session used by the current thread.
+
+        :return: :class:`Session <Session>` object
+        :rtype: flinks.session.Session
+
+        """
+        if self._session is not None:
+            return self._session
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._create_session()
+        return session
+
+    @session.setter
+    def session(self, session):
+        """ Sets the HTTP session used by the client.
+
+        The session is used by all the threads (or by the current thread only if
+        ``thread_local_sessions`` is enabled). The default headers are added to the session unless
+        they are already defined.
+
+        """
+        for name, value in DEFAULT_HEADERS.items():
+            session.headers.setdefault(name, value)
+        if self.thread_local_sessions:
+            self._local.session = session
+        else:
+            self._session = session
+
         ##################################
         # PRIVATE METHODS AND PROPERTIES #
         ##################################
 
+    def _create_session(self):
+        """ Creates an HTTP session using the shared connection pool. """
+        session = Session()
+        session.headers.update(DEFAULT_HEADERS)
+        session.mount(self.api_endpoint, self._adapter)
+        if self.session_hook is not None:
+            self.session_hook(session)
+        return session
+
+    @contextmanager
+    def _use_session(self, session):
+        """ Makes the current thread use the given session (eg. the one of another thread). """
+        if not self.thread_local_sessions:
+            yield
+            return
+        previous = getattr(self._local, 'session', None)
+        self._local.session = session
+        try:
+            yield
+        finally:
+            self._local.session = previous
+
     def _call(self, http_method, path, params=None, data=None):
         """ Calls the API endpoint. """
-        # Prepares the headers and parameters that will be used to forge the request.
-        headers = {'cache-control': 'no-cache', 'Content-Type': 'application/json'}
-        params = params or {}
+        # The session is resolved in the calling thread since the request may be performed by
+        # another thread (eg. when hedging is enabled).
+        session = self.session
+        try:
+            if self.scheduler is None:
+                return self._guarded_call(session, http_method, path, params=params, data=data)
 
-        # Calls the API endpoint!
-        request = getattr(self.session, http_method.lower())
+            # Waits for the call to be admitted according to its priority and its deadline.
+            with self.scheduler.slot():
+                return self._guarded_call(session, http_method, path, params=params, data=data)
+        except (ProtocolError, TransportError) as e:
+            # A RequestId rejected by the Flinks service (eg. because its session expired) must not
+            # be reused by subsequent authorizations.
+            if self.request_id_cache is not None and _is_rejection(e):
+                request_id = (data or {}).get('RequestId') or path.rsplit('/', 1)[-1]
+                self.request_id_cache.delete_request_id(request_id)
+            raise
+
+    def _guarded_call(self, session, http_method, path, params=None, data=None):
+        """ Calls the API endpoint unless its circuit breakers are open. """
+        if self.circuit_breakers is None:
+            return self._send(session, http_method, path, params=params, data=data)
+
+        # Fails fast if the endpoint or the institution targeted by the call is known to be failing.
+        keys = self.circuit_breakers.keys_for(path, data)
+        self.circuit_breakers.before_call(keys)
         try:
-            response = request(
-                urljoin(self.api_endpoint, path), headers=headers, params=params, json=data,
+            response_data = self._send(session, http_method, path, params=params, data=data)
+        except RequestException:
+            self.circuit_breakers.record(keys, success=False)
+            raise
+        except TransportError as e:
+            self.circuit_breakers.record(
+                keys, success=e.response is not None and e.response.status_code < 500,
             )
+            raise
+        except ProtocolError:
+            self.circuit_breakers.record(keys, success=True)
+            raise
+        except BaseException:
+            # Errors that are not related to the target (eg. unserializable data) are not counted;
+            # the probe slots granted for the call must still be given back.
+            self.circuit_breakers.release(keys)
+            raise
+        self.circuit_breakers.record(keys, success=True)
+
+        # Keeps track of the institution associated with the generated identifiers so that
+        # subsequent calls (eg. GetAccountsDetail) can be attributed to the right institution.
+        data = data or {}
+        response_data_dict = response_data if isinstance(response_data, dict) else {}
+        institution = data.get('Institution') or response_data_dict.get('Institution')
+        if institution is not None:
+            login = response_data_dict.get('Login')
+            login_id = login.get('Id') if isinstance(login, dict) else data.get('LoginId')
+            self.circuit_breakers.remember_institution(
+                response_data_dict.get('RequestId'), institution,
+            )
+            self.circuit_breakers.remember_institution(login_id, institution)
+
+        return response_data
+
+    def _send(self, session, http_method, path, params=None, data=None):
+        """ Sends the request, possibly along with a duplicate one if hedging is enabled. """
+        if self.hedging is None:
+            return self._perform_call(session, http_method, path, params=params, data=data)
+
+        # Duplicate requests are performed in their own scheduler slot (using the priority and the
+        # deadline of the original call) so that hedging does not exceed the allowed concurrency.
+        hedge = None
+        if self.scheduler is not None:
+            hedge = functools.partial(self._perform_scheduled_call, *self.scheduler.settings())
+        return self.hedging.call(
+            '/'.join(path.split('/')[:2]), self._perform_call, session, http_method, path,
+            params=params, data=data, hedge=hedge,
+        )
+
+    def _perform_scheduled_call(self, priority, deadline, cancelled, *args, **kwargs):
+        """ Performs the HTTP request once a scheduler slot is available (unless cancelled). """
+        with self.scheduler.slot(priority, deadline):
+            # The original call may have completed while waiting for the slot, in which case the
+            # duplicate request is not sent.
+            if cancelled.is_set():
+                return None
+            return self._perform_call(*args, **kwargs)
+
+    def _perform_call(self, session, http_method, path, params=None, data=None):
+        """ Performs the actual HTTP request and processes the response. """
+        if self.profiler is None or not self.profiler.should_sample():
+            return self._process_response(self._request(session, http_method, path, params, data))
+
+        with self.profiler.record('/'.join(path.split('/')[:2])) as call:
+            response = self._request(session, http_method, path, params, data)
+            call['response_size'] = _get_response_size(response)
+            return self._process_response(response)
+
+    def _request(self, session, http_method, path, params=None, data=None):
+        """ Performs the actual HTTP request. """
+        # Calls the API endpoint! Default headers are set on the session and entity paths are
+        # always relative to the API endpoint, so neither have to be built for each call.
+        request = getattr(session, _SESSION_METHODS.get(http_method) or http_method.lower())
+        try:
+            response = request(self.api_endpoint + path, params=params, json=data)
             response.raise_for_status()
         except HTTPError:
             if response.status_code != 400:
@@ -83,7 +291,10 @@ class Client:
                     ),
                     response=response,
                 )
+        return response
 
+    def _process_response(self, response):
+        """ Deserializes the response and handles potential errors. """
         # Ensures the response body can be deserialized to JSON.
         try:
             response_data = response.json()
@@ -101,3 +312,19 @@ class Client:
             )
 
         return response_data
+
+
+def _get_response_size(response):
+    """ Returns the size of the body of a response (in bytes). """
+    try:
+        return len(response.content)
+    except TypeError:
+        return 0
+
+
+def _is_rejection(error):
+    """ Returns a boolean indicating whether an error means that the request was rejected. """
+    if isinstance(error, ProtocolError):
+        return error.data is not None
+    status_code = getattr(error.response, 'status_code', None)
+    return status_code is not None and 400 <= status_code < 500
@@ -9,8 +9,13 @@
 """
 
 import datetime as dt
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.exceptions import RequestException
 
 from ..baseapi import BaseApi
+from ..exceptions import CircuitOpenError, TransportError
 
 
 class BankingServices(BaseApi):
@@ -52,6 +57,19 @@ class BankingServices(BaseApi):
         :rtype: dictionary
 
         """
+        # Reuses a still valid RequestId generated for the same LoginId when only cached data is
+        # requested.
+        cache = self._client.request_id_cache
+        cacheable = (
+            cache is not None and most_recent_cached and login_id is not None and
+            request_id is None and not (username and password) and security_responses is None and
+            save is None and schedule_refresh is None and tag is None
+        )
+        if cacheable:
+            response_data = cache.get(login_id)
+            if response_data is not None:
+                return response_data
+
         data = {'MostRecentCached': most_recent_cached, }
         if request_id is not None:
             data['RequestId'] = request_id
@@ -70,7 +88,13 @@ class BankingServices(BaseApi):
             data['ScheduleRefresh'] = schedule_refresh
         if tag is not None:
             data['Tag'] = tag
-        return self._client._call('POST', self._build_path('Authorize'), data=data)
+        response_data = self._client._call('POST', self._build_path('Authorize'), data=data)
+
+        if cacheable and response_data.get('HttpStatusCode', 200) == 200 and \
+                response_data.get('RequestId'):
+            cache.set(login_id, response_data)
+
+        return response_data
 
     def authorize_multiple(self, login_ids=None):
         """ Exchanges multiple credentials for pairs of LoginIds and RequestIds.
@@ -150,6 +174,97 @@ class BankingServices(BaseApi):
             data['AccountsFilter'] = accounts_filter
         return self._client._call('POST', self._build_path('GetAccountsDetail'), data=data)
 
+    def iter_accounts_detail_windows(
+        self, request_id, date_from, date_to, window_days=None, with_account_identity=False,
+        accounts_filter=None, max_workers=4, max_retries=2, retry_backoff=0.5,
+    ):
+        """ Retrieves the transactions of a specific user over a date range, window by window.
+
+        The date range is split into windows (calendar months by default) that are fetched
+        concurrently. Results are yielded in chronological order and transactions that were already
+        returned for a previous window (same account and transaction IDs) are removed. Each window
+        is retried on its own (with an exponential backoff) if it fails because of a connection
+        error or a server error. The priority and the deadline defined using the scheduler of the
+        client in the current thread (as well as its HTTP session) also apply to the windows.
+
+        :param request_id: valid request ID
+        :param date_from: start date of the range
+        :param date_to: end date of the range
+        :param window_days:
+            number of days per window, at least 1 (calendar months are used if not provided)
+        :param with_account_identity:
+            whether to include information about the account in the responses
+        :param accounts_filter: list of user account IDs to target specificaly
+        :param max_workers: maximum number of windows that can be fetched concurrently
+        :param max_retries: maximum number of times a failing window should be fetched again
+        :param retry_backoff: number of seconds to wait before the first retry (doubled afterwards)
+        :type request_id: str
+        :type date_from: datetime.datetime or datetime.date or str
+        :type date_to: datetime.datetime or datetime.date or str
+        :type window_days: int
+        :type with_account_identity: bool
+        :type accounts_filter: list
+        :type max_workers: int
+        :type max_retries: int
+        :type retry_backoff: int or float
+        :return: generator of (window start date, window end date, response dictionary) tuples
+        :rtype: generator
+
+        """
+        scheduler = self._client.scheduler
+        scheduler_settings = scheduler.settings() if scheduler is not None else None
+        session = self._client.session
+
+        def _fetch(window_from, window_to):
+            attempt = 0
+            while True:
+                try:
+                    return _fetch_window(window_from, window_to)
+                except CircuitOpenError:
+                    raise
+                except (TransportError, RequestException) as e:
+                    # Client errors (eg. an expired RequestId) will not be fixed by retrying.
+                    status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+                    if status_code is not None and status_code < 500 or attempt >= max_retries:
+                        raise
+                    time.sleep(retry_backoff * 2 ** attempt)
+                    attempt += 1
+
+        def _fetch_window(window_from, window_to):
+            kwargs = {
+                'with_account_identity': with_account_identity, 'with_transactions': True,
+                'date_from': window_from, 'date_to': window_to, 'accounts_filter': accounts_filter,
+            }
+            with self._client._use_session(session):
+                if scheduler_settings is None:
+                    return self.get_accounts_detail(request_id, **kwargs)
+                priority, deadline = scheduler_settings
+                with scheduler.context(priority=priority, deadline=deadline):
+                    return self.get_accounts_detail(request_id, **kwargs)
+
+        windows = _split_date_range(_to_date(date_from), _to_date(date_to), window_days)
+        seen_transactions = set()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = []
+        try:
+            futures.extend(executor.submit(_fetch, *window) for window in windows)
+            for (window_from, window_to), future in zip(windows, futures):
+                response_data = future.result()
+                for account in response_data.get('Accounts') or []:
+                    transactions = []
+                    for transaction in account.get('Transactions') or []:
+                        key = (account.get('Id'), transaction.get('Id'))
+                        if transaction.get('Id') is not None and key in seen_transactions:
+                            continue
+                        seen_transactions.add(key)
+                        transactions.append(transaction)
+                    account['Transactions'] = transactions
+                yield window_from, window_to, response_data
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
     def get_accounts_detail_async(self, request_id):
         """ Retrieves complete details about a specific user (async mode).
 
@@ -170,6 +285,8 @@ class BankingServices(BaseApi):
         :rtype: dictionary
 
         """
+        if self._client.request_id_cache is not None:
+            self._client.request_id_cache.delete(login_id)
         return self._client._call('DELETE', self._build_path('DeleteCard/' + login_id))
 
     def get_statements(self, request_id, number_of_statements=None, accounts_filter=None):
@@ -243,3 +360,30 @@ class BankingServices(BaseApi):
         """
         data = {'LoginId': login_id, 'IsActivated': is_activated, }
         return self._client._call('PATCH', self._build_path('SetScheduledRefresh'), data=data)
+
+
+def _to_date(value):
+    """ Converts a datetime, a date or an ISO-formatted string to a date. """
+    if isinstance(value, dt.datetime):
+        return value.date()
+    elif isinstance(value, dt.date):
+        return value
+    return dt.datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def _split_date_range(date_from, date_to, window_days=None):
+    """ Splits a date range into consecutive non-overlapping windows of (start, end) dates. """
+    if window_days is not None and window_days < 1:
+        raise ValueError('window_days must be at least 1 (got {})'.format(window_days))
+    windows = []
+    window_from = date_from
+    while window_from <= date_to:
+        if window_days is not None:
+            window_to = window_from + dt.timedelta(days=window_days - 1)
+        else:
+            next_month = (window_from.replace(day=28) + dt.timedelta(days=4)).replace(day=1)
+            window_to = next_month - dt.timedelta(days=1)
+        window_to = min(window_to, date_to)
+        windows.append((window_from, window_to))
+        window_from = window_to + dt.timedelta(days=1)
+    return windows
@@ -32,3 +32,20 @@ class ProtocolError(FlinksError):
         super().__init__(msg)
         self.response = response
         self.data = data
+
+
+class CircuitOpenError(TransportError):
+    """ Raised when a call is rejected because the circuit of its target is currently open. """
+
+    def __init__(self, msg, kind=None, name=None):
+        super().__init__(msg, response=None)
+        self.kind = kind
+        self.name = name
+
+
+class DeadlineExceededError(FlinksError):
+    """ Raised when a call is dropped because its deadline passed before it could be sent. """
+
+
+class ArchiveError(FlinksError):
+    """ Raised when a transaction archive file cannot be read. """
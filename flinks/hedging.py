@@ -0,0 +1,236 @@
+"""
+    Flinks request hedging
+    ======================
+
+    This module defines the ``HedgingPolicy`` class allowing to reduce the tail latency of
+    idempotent read endpoints: if no response is received within a delay computed from the
+    latencies observed so far, a duplicate request is sent and the first response to arrive is
+    used. The number of duplicate requests is capped by a budget so that the load on the Flinks
+    service does not double.
+
+    Requests are performed by a pool of threads that grows with the number of concurrent calls
+    (idle threads are reused, then stopped after a while) so that hedging never limits the
+    concurrency of the client.
+
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+
+
+DEFAULT_ENDPOINTS = (
+    'BankingServices/GetAccountsSummary',
+    'BankingServices/GetAccountsDetailAsync',
+)
+
+
+class HedgingPolicy:
+    """ Sends duplicate requests for slow calls to idempotent read endpoints. """
+
+    def __init__(
+        self, endpoints=DEFAULT_ENDPOINTS, percentile=95, initial_delay=1, min_delay=0.05,
+        budget=0.1, max_tokens=10, window_size=1000, min_samples=20, idle_timeout=60, clock=None,
+    ):
+        """ Initializes the hedging policy.
+
+        :param endpoints: names of the endpoints whose calls can be hedged
+        :param percentile: percentile of the observed latencies after which calls are hedged
+        :param initial_delay: delay (in seconds) used until enough latencies have been observed
+        :param min_delay: minimum delay (in seconds) after which calls are hedged
+        :param budget: maximum ratio of hedged calls to eligible calls
+        :param max_tokens: maximum number of hedged calls that can be sent in a burst
+        :param window_size: number of recent latencies used to compute the hedging delay
+        :param min_samples: number of latencies to observe before using the percentile
+        :param idle_timeout: number of seconds after which idle threads of the pool are stopped
+        :param clock: callable returning the current time in seconds (defaults to a monotonic clock)
+        :type endpoints: tuple
+        :type percentile: int or float
+        :type initial_delay: int or float
+        :type min_delay: int or float
+        :type budget: float
+        :type max_tokens: int or float
+        :type window_size: int
+        :type min_samples: int
+        :type idle_timeout: int or float
+        :type clock: callable
+
+        """
+        self.endpoints = frozenset(endpoints)
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.budget = budget
+        self.max_tokens = max_tokens
+        self.min_samples = min_samples
+        self.idle_timeout = idle_timeout
+        self.clock = clock or time.monotonic
+        self._latencies = deque(maxlen=window_size)
+        self._delay = initial_delay
+        self._samples_since_update = 0
+        self._tokens = 0
+        self._lock = threading.Lock()
+        self._pool = _ThreadPool(idle_timeout)
+        self._counters = {
+            'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'primary_wins': 0, 'budget_exhausted': 0,
+        }
+
+    @property
+    def delay(self):
+        """ Returns the current delay (in seconds) after which calls are hedged. """
+        return self._delay
+
+    def stats(self):
+        """ Returns a dictionary of metrics related to the hedged calls.
+
+        The dictionary contains the number of eligible ``calls``, the number of ``hedged`` calls,
+        the number of hedged calls for which the duplicate request won (``hedge_wins``) or the
+        original request won (``primary_wins``), the number of calls that could not be hedged
+        because the budget was exhausted (``budget_exhausted``) and the current ``delay``.
+
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats['delay'] = self._delay
+        return stats
+
+    def call(self, endpoint, func, *args, hedge=None, **kwargs):
+        """ Calls ``func`` and hedges the call if the endpoint is eligible and the call is slow.
+
+        :param endpoint: name of the endpoint targeted by the call
+        :param func: callable performing the request
+        :param hedge:
+            callable performing the duplicate request (``func`` is used if not provided); this can
+            be used to perform additional work such as acquiring a scheduler slot. It is called
+            with a ``threading.Event`` (set once the call returned, which means that the duplicate
+            request is not needed anymore) followed by the arguments of ``func``
+        :type endpoint: str
+        :type func: callable
+        :type hedge: callable
+
+        """
+        if endpoint not in self.endpoints:
+            return func(*args, **kwargs)
+
+        with self._lock:
+            self._counters['calls'] += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.budget)
+            delay = self._delay
+
+        primary = self._pool.submit(self._timed, func, *args, **kwargs)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+
+        with self._lock:
+            can_hedge = self._tokens >= 1
+            if can_hedge:
+                self._tokens -= 1
+                self._counters['hedged'] += 1
+            else:
+                self._counters['budget_exhausted'] += 1
+        if not can_hedge:
+            return primary.result()
+
+        cancelled = threading.Event()
+        if hedge is None:
+            hedge = self._pool.submit(func, *args, **kwargs)
+        else:
+            hedge = self._pool.submit(hedge, cancelled, *args, **kwargs)
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        with self._lock:
+                            self._counters[
+                                'hedge_wins' if future is hedge else 'primary_wins'
+                            ] += 1
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            cancelled.set()
+
+    def shutdown(self):
+        """ Stops the idle threads used to perform the calls. """
+        self._pool.shutdown()
+
+    def _timed(self, func, *args, **kwargs):
+        # Latencies are measured from the moment the request is actually performed.
+        start = self.clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._record_latency(self.clock() - start)
+
+    def _record_latency(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._samples_since_update += 1
+            # The delay is not recomputed for every call in order to avoid sorting the latencies
+            # window each time.
+            if len(self._latencies) < self.min_samples or self._samples_since_update < 10:
+                return
+            self._samples_since_update = 0
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        self._delay = max(self.min_delay, latencies[index])
+
+
+class _ThreadPool:
+    """ Pool of threads growing with the number of submitted tasks and reusing idle threads. """
+
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self._tasks = queue.Queue()
+        self._idle = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            spawn = self._idle == 0
+            if not spawn:
+                self._idle -= 1
+            self._tasks.put((future, func, args, kwargs))
+        if spawn:
+            threading.Thread(target=self._work, daemon=True).start()
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, 0
+            for _ in range(idle):
+                self._tasks.put(None)
+
+    def _work(self):
+        while True:
+            try:
+                task = self._tasks.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    # Each queued task is promised to an idle thread; the thread can only be
+                    # stopped if it is not needed for one of them.
+                    if self._idle > self._tasks.qsize():
+                        self._idle -= 1
+                        return
+                continue
+            if task is None:
+                return
+            future, func, args, kwargs = task
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            del future, func, args, kwargs, task
+            with self._lock:
+                self._idle += 1
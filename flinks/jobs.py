@@ -0,0 +1,338 @@
+"""
+    Flinks job queue
+    ================
+
+    This module defines the ``JobQueue`` class, a durable work queue backed by a local SQLite
+    database, and the ``Worker`` class allowing to perform the ``BankingServices`` operations (eg.
+    ``authorize`` or ``get_accounts_detail``) stored in such a queue. Any number of worker processes
+    can share a queue: jobs are leased for a limited amount of time (visibility timeout), retried
+    when they fail because of transient errors and moved to a dead-letter state once they have been
+    attempted too many times. Workers extend the leases of the jobs they are performing so that slow
+    operations are not leased twice.
+
+    The queue relies on the locking of the SQLite database file: worker processes should run on the
+    host storing the file. The WAL journal mode (used by default for its better concurrency) does
+    not work at all on network filesystems; ``wal=False`` can be used in order to use a rollback
+    journal instead, but sharing a SQLite database over a network filesystem is only safe if the
+    filesystem implements file locks correctly.
+
+"""
+
+import inspect
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+from requests.exceptions import RequestException
+
+from .exceptions import FlinksError, ProtocolError
+
+
+Job = namedtuple('Job', ['id', 'operation', 'payload', 'attempts', 'lease_token'])
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+
+class JobQueue:
+    """ Durable queue of ``BankingServices`` operations shared between worker processes. """
+
+    def __init__(
+        self, path, visibility_timeout=300, max_attempts=5, retry_delay=30, clock=None, timeout=30,
+        wal=True,
+    ):
+        """ Initializes the queue.
+
+        :param path: path of the SQLite database file
+        :param visibility_timeout:
+            number of seconds after which a leased job that was not completed can be leased again
+        :param max_attempts: maximum number of times a job can be attempted before being dead
+        :param retry_delay: base number of seconds to wait before retrying a failed job
+        :param clock: callable returning the current time in seconds
+        :param timeout: number of seconds to wait for the database lock
+        :param wal:
+            whether to use the WAL journal mode (which requires all the processes using the queue to
+            run on the same host)
+        :type path: str
+        :type visibility_timeout: int or float
+        :type max_attempts: int
+        :type retry_delay: int or float
+        :type clock: callable
+        :type timeout: int or float
+        :type wal: bool
+
+        """
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.clock = clock or time.time
+        self.timeout = timeout
+        self.wal = wal
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS flinks_jobs ('
+                'id TEXT PRIMARY KEY, operation TEXT NOT NULL, payload TEXT NOT NULL, '
+                'state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                'available_at REAL NOT NULL, lease_token TEXT, lease_expires_at REAL, '
+                'last_error TEXT, result TEXT)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS flinks_jobs_ready '
+                'ON flinks_jobs (state, available_at)'
+            )
+
+    def put(self, operation, payload=None, job_id=None):
+        """ Adds a job to the queue; returns its ID.
+
+        :param operation: name of the ``BankingServices`` method to call (eg. "authorize")
+        :param payload: dictionary of keyword arguments to pass to the method
+        :param job_id: ID of the job (a job that already exists with the same ID is not added again)
+        :type operation: str
+        :type payload: dict
+        :type job_id: str
+        :return: ID of the job
+        :rtype: str
+
+        """
+        return self.put_many([(operation, payload, job_id)])[0]
+
+    def put_many(self, jobs):
+        """ Adds many (operation, payload, job_id) jobs to the queue; returns their IDs. """
+        job_ids = []
+        now = self.clock()
+        with self._transaction() as connection:
+            for operation, payload, job_id in jobs:
+                job_id = job_id or uuid.uuid4().hex
+                connection.execute(
+                    'INSERT OR IGNORE INTO flinks_jobs '
+                    '(id, operation, payload, state, available_at) VALUES (?, ?, ?, ?, ?)',
+                    (job_id, operation, json.dumps(payload or {}), PENDING, now),
+                )
+                job_ids.append(job_id)
+        return job_ids
+
+    def lease(self, visibility_timeout=None):
+        """ Leases the next available job; returns ``None`` if no job is available.
+
+        :param visibility_timeout: overrides the visibility timeout of the queue for this lease
+        :type visibility_timeout: int or float
+        :return: leased job
+        :rtype: flinks.jobs.Job
+
+        """
+        now = self.clock()
+        with self._transaction() as connection:
+            # Jobs whose lease expired after their last allowed attempt are dead-lettered.
+            connection.execute(
+                'UPDATE flinks_jobs SET state = ?, lease_token = NULL, last_error = ? '
+                'WHERE state = ? AND lease_expires_at <= ? AND attempts >= ?',
+                (DEAD, 'Lease expired', LEASED, now, self.max_attempts),
+            )
+            row = connection.execute(
+                'SELECT id, operation, payload, attempts FROM flinks_jobs '
+                'WHERE (state = ? AND available_at <= ?) OR (state = ? AND lease_expires_at <= ?) '
+                'ORDER BY available_at LIMIT 1',
+                (PENDING, now, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            lease_token = uuid.uuid4().hex
+            timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+            connection.execute(
+                'UPDATE flinks_jobs SET state = ?, attempts = attempts + 1, lease_token = ?, '
+                'lease_expires_at = ? WHERE id = ?',
+                (LEASED, lease_token, now + timeout, row[0]),
+            )
+        return Job(row[0], row[1], json.loads(row[2]), row[3] + 1, lease_token)
+
+    def extend(self, job, visibility_timeout=None):
+        """ Extends the lease of a job; returns ``False`` if the lease was lost. """
+        timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        return self._update_leased(
+            job, 'lease_expires_at = ?', (self.clock() + timeout, ),
+        )
+
+    def complete(self, job, result=None):
+        """ Marks a job as done; returns ``False`` if the lease of the job was lost. """
+        return self._update_leased(
+            job, 'state = ?, lease_token = NULL, result = ?',
+            (DONE, None if result is None else json.dumps(result)),
+        )
+
+    def fail(self, job, error, retry=True):
+        """ Marks a job as failed; returns ``False`` if the lease of the job was lost.
+
+        The job is retried later (with an exponential backoff) unless ``retry`` is ``False`` or the
+        job was attempted too many times, in which case it is dead-lettered.
+
+        """
+        if not retry or job.attempts >= self.max_attempts:
+            return self._update_leased(
+                job, 'state = ?, lease_token = NULL, last_error = ?', (DEAD, str(error)),
+            )
+        available_at = self.clock() + self.retry_delay * 2 ** (job.attempts - 1)
+        return self._update_leased(
+            job, 'state = ?, lease_token = NULL, available_at = ?, last_error = ?',
+            (PENDING, available_at, str(error)),
+        )
+
+    def dead_letters(self):
+        """ Returns a list of (job, last error) tuples for the dead-lettered jobs. """
+        with self._transaction() as connection:
+            rows = connection.execute(
+                'SELECT id, operation, payload, attempts, last_error FROM flinks_jobs '
+                'WHERE state = ? ORDER BY id',
+                (DEAD, ),
+            ).fetchall()
+        return [(Job(r[0], r[1], json.loads(r[2]), r[3], None), r[4]) for r in rows]
+
+    def requeue_dead_letters(self):
+        """ Moves the dead-lettered jobs back to the queue; returns the number of moved jobs. """
+        with self._transaction() as connection:
+            return connection.execute(
+                'UPDATE flinks_jobs SET state = ?, attempts = 0, available_at = ? WHERE state = ?',
+                (PENDING, self.clock(), DEAD),
+            ).rowcount
+
+    def result(self, job_id):
+        """ Returns the stored result of a completed job (if any). """
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT result FROM flinks_jobs WHERE id = ?', (job_id, ),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None and row[0] is not None else None
+
+    def stats(self):
+        """ Returns a dictionary containing the number of jobs in each state. """
+        stats = {PENDING: 0, LEASED: 0, DONE: 0, DEAD: 0}
+        with self._transaction() as connection:
+            stats.update(connection.execute(
+                'SELECT state, COUNT(*) FROM flinks_jobs GROUP BY state',
+            ).fetchall())
+        return stats
+
+    def _update_leased(self, job, assignments, params):
+        with self._transaction() as connection:
+            return connection.execute(
+                'UPDATE flinks_jobs SET ' + assignments + ' WHERE id = ? AND lease_token = ?',
+                params + (job.id, job.lease_token),
+            ).rowcount == 1
+
+    @contextmanager
+    def _transaction(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        try:
+            connection.execute('PRAGMA journal_mode=' + ('WAL' if self.wal else 'DELETE'))
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+
+
+class Worker:
+    """ Performs the jobs of a queue using a Flinks client. """
+
+    def __init__(
+        self, queue, client, store_results=False, on_result=None, poll_interval=1,
+        heartbeat_interval=None,
+    ):
+        """ Initializes the worker.
+
+        :param queue: queue containing the jobs to perform
+        :param client: Flinks client used to perform the jobs
+        :param store_results: whether to store the results of the jobs in the queue
+        :param on_result: callable called with the job and its result once a job is performed
+        :param poll_interval: number of seconds to wait when no job is available
+        :param heartbeat_interval:
+            number of seconds between two extensions of the lease of the job being performed
+            (defaults to a third of the visibility timeout of the queue)
+        :type queue: flinks.jobs.JobQueue
+        :type client: flinks.client.Client
+        :type store_results: bool
+        :type on_result: callable
+        :type poll_interval: int or float
+        :type heartbeat_interval: int or float
+
+        """
+        self.queue = queue
+        self.client = client
+        self.store_results = store_results
+        self.on_result = on_result
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+
+    def run(self, max_jobs=None, stop_when_empty=True):
+        """ Performs jobs until the queue is empty (or forever); returns the number of jobs run. """
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            job = self.queue.lease()
+            if job is None:
+                if stop_when_empty:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            self.perform(job)
+            count += 1
+        return count
+
+    def perform(self, job):
+        """ Performs a single leased job and records its outcome in the queue. """
+        operation = getattr(self.client.banking_services, job.operation, None)
+        if job.operation.startswith('_') or not callable(operation):
+            self.queue.fail(job, 'Unknown operation: {}'.format(job.operation), retry=False)
+            return
+
+        # Invalid payloads will not become valid; they are detected before calling the operation so
+        # that errors raised by the operation itself are not mistaken for them.
+        try:
+            inspect.signature(operation).bind(**job.payload)
+        except TypeError as e:
+            self.queue.fail(job, 'Invalid payload: {}'.format(e), retry=False)
+            return
+
+        try:
+            with self._heartbeat(job):
+                result = operation(**job.payload)
+        except ProtocolError as e:
+            # Errors reported by the Flinks service (eg. invalid LoginIds) will not go away.
+            self.queue.fail(job, e, retry=False)
+            return
+        except (FlinksError, RequestException) as e:
+            # Other errors (transport errors, open circuits, missed deadlines, ...) are transient.
+            self.queue.fail(job, e)
+            return
+
+        if self.on_result is not None:
+            self.on_result(job, result)
+        self.queue.complete(job, result if self.store_results else None)
+
+    @contextmanager
+    def _heartbeat(self, job):
+        """ Extends the lease of the job periodically until the block exits. """
+        interval = self.heartbeat_interval or self.queue.visibility_timeout / 3
+        stopped = threading.Event()
+
+        def _extend():
+            while not stopped.wait(interval):
+                if not self.queue.extend(job):
+                    return
+
+        thread = threading.Thread(target=_extend, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
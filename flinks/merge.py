@@ -0,0 +1,153 @@
+"""
+    Flinks transaction merging
+    ==========================
+
+    This module defines the ``TransactionIndex`` class allowing to fold the transactions returned by
+    overlapping ``get_accounts_detail`` calls into an existing history in linear time. Transactions
+    are identified by their account ID and transaction ID. Transactions without IDs are matched
+    using a composite key (account ID, date, amounts and description); identical transactions (eg.
+    two coffees bought the same day) are kept as long as a fetch contains more of them than the
+    history. Since transaction IDs can change between fetches, transactions with unknown IDs can
+    also be matched using the composite key (``match_changed_ids``): this is only safe when the
+    fetches contain all the transactions of the considered days (which is not the case of delta
+    fetches).
+
+    To keep memory bounded, the index only stores the hashes of the keys rather than the keys
+    themselves; this trades exactness for a (negligible) probability of hash collisions.
+
+"""
+
+from collections import Counter
+
+
+class TransactionIndex:
+    """ Index of the transactions of a history allowing to detect duplicates. """
+
+    def __init__(self, match_changed_ids=False):
+        """ Initializes the index.
+
+        :param match_changed_ids:
+            whether transactions whose IDs are unknown should be considered as duplicates if they
+            match a transaction of the history using the composite key (this must not be used with
+            partial fetches such as delta fetches)
+        :type match_changed_ids: bool
+
+        """
+        self.match_changed_ids = match_changed_ids
+        self._ids = set()
+        self._composites = Counter()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_accounts_detail(cls, history, **kwargs):
+        """ Creates an index of the transactions contained in an account details response. """
+        index = cls(**kwargs)
+        for account in history.get('Accounts') or []:
+            for transaction in account.get('Transactions') or []:
+                index.add(account.get('Id'), transaction)
+        return index
+
+    def add(self, account_id, transaction):
+        """ Indexes a transaction without checking whether it is a duplicate. """
+        transaction_id = transaction.get('Id')
+        if transaction_id is not None:
+            self._ids.add(hash((account_id, transaction_id)))
+        self._composites[_composite_key(account_id, transaction)] += 1
+        self.size += 1
+
+    def merge(self, account_id, transactions):
+        """ Indexes the transactions of an account that are not duplicates; returns them.
+
+        :param account_id: ID of the account of the transactions
+        :param transactions: list of transaction dictionaries returned by ``get_accounts_detail``
+        :type account_id: str
+        :type transactions: list
+        :return: list of the transactions that were not already present in the index
+        :rtype: list
+
+        """
+        # First pass: transactions whose IDs are known are duplicates; they consume the composite
+        # keys they are associated with.
+        keys = []
+        matched = Counter()
+        for transaction in transactions:
+            transaction_id = transaction.get('Id')
+            id_key = hash((account_id, transaction_id)) if transaction_id is not None else None
+            composite_key = _composite_key(account_id, transaction)
+            known = id_key is not None and id_key in self._ids
+            if known:
+                matched[composite_key] += 1
+            keys.append((id_key, composite_key, known))
+
+        # Second pass: remaining transactions without IDs (or whose IDs may have changed) are
+        # duplicates as long as the history contains more occurrences of their composite keys than
+        # what was matched.
+        new_transactions = []
+        occurrences = Counter()
+        for transaction, (id_key, composite_key, known) in zip(transactions, keys):
+            if known:
+                continue
+            if id_key is not None:
+                # The same transaction may be returned more than once by a single fetch.
+                if id_key in self._ids:
+                    continue
+                self._ids.add(id_key)
+            if id_key is None or self.match_changed_ids:
+                occurrences[composite_key] += 1
+                remaining = self._composites[composite_key] - matched[composite_key]
+                if occurrences[composite_key] <= remaining:
+                    continue
+            self._composites[composite_key] += 1
+            self.size += 1
+            new_transactions.append(transaction)
+        return new_transactions
+
+
+def merge_accounts_detail(history, response_data, index=None, match_changed_ids=False):
+    """ Folds the transactions of an account details response into a history.
+
+    :param history: account details response used as history (updated in place)
+    :param response_data: new account details response
+    :param index: index of the history (built from the history if not provided)
+    :param match_changed_ids:
+        whether transactions with unknown IDs can be matched using the composite key (only used
+        when the index is built from the history; see ``TransactionIndex``)
+    :type history: dict
+    :type response_data: dict
+    :type index: flinks.merge.TransactionIndex
+    :type match_changed_ids: bool
+    :return: number of transactions added to the history
+    :rtype: int
+
+    """
+    if index is None:
+        index = TransactionIndex.from_accounts_detail(
+            history, match_changed_ids=match_changed_ids,
+        )
+    accounts = history.setdefault('Accounts', [])
+    accounts_by_id = {account.get('Id'): account for account in accounts}
+    added = 0
+    for account in response_data.get('Accounts') or []:
+        account_id = account.get('Id')
+        new_transactions = index.merge(account_id, account.get('Transactions') or [])
+        history_account = accounts_by_id.get(account_id)
+        if history_account is None:
+            history_account = accounts_by_id[account_id] = dict(account, Transactions=[])
+            accounts.append(history_account)
+        history_account.setdefault('Transactions', []).extend(new_transactions)
+        added += len(new_transactions)
+    return added
+
+
+def _composite_key(account_id, transaction):
+    return hash((
+        account_id, transaction.get('Date'), _amount(transaction.get('Debit')),
+        _amount(transaction.get('Credit')), transaction.get('Description'),
+    ))
+
+
+def _amount(value):
+    return None if value is None else round(float(value) * 100)
@@ -0,0 +1,225 @@
+"""
+    Flinks authorization flows
+    ==========================
+
+    This module defines the ``AuthorizeFlow`` class, a state machine driving the whole
+    ``authorize`` process (including multi-factor authentication challenges) until a RequestId is
+    obtained, and the ``MfaDriver`` class allowing to run many such flows concurrently. Challenges
+    are answered using a pluggable answer store; the answers stored on the Flinks side are only
+    retrieved (``get_mfa_questions``) when a challenge cannot be answered using the local store, so
+    that each flow performs the minimum number of calls.
+
+    ``authorize`` calls are not idempotent: only the calls that do not carry credentials or answers
+    to security challenges (eg. ``most_recent_cached`` authorizations of a LoginId) are retried if
+    they fail because of a transient error. Resending credentials or answers that may already have
+    been processed by the financial institution could lock the account of the user.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.exceptions import RequestException
+
+from .exceptions import CircuitOpenError, FlinksError, TransportError
+
+
+class MemoryAnswerStore:
+    """ Keeps the answers to security questions in the memory of the current process. """
+
+    def __init__(self, answers=None):
+        """ Initializes the store.
+
+        :param answers: dictionary of the form ``{login_id: {question: answer}}``
+        :type answers: dict
+
+        """
+        self._answers = {}
+        for login_id, questions in (answers or {}).items():
+            for question, answer in questions.items():
+                self.set(login_id, question, answer)
+
+    def get(self, login_id, question):
+        """ Returns the answer to a security question for the given LoginId (if any). """
+        return self._answers.get((login_id, _normalize(question)))
+
+    def set(self, login_id, question, answer):
+        """ Stores the answer to a security question for the given LoginId. """
+        self._answers[(login_id, _normalize(question))] = answer
+
+
+class AuthorizeFlow:
+    """ Drives an authorization until a RequestId is obtained (or the flow fails). """
+
+    STARTED = 'started'
+    CHALLENGED = 'challenged'
+    AUTHORIZED = 'authorized'
+    FAILED = 'failed'
+
+    def __init__(self, client, answer_store=None, max_rounds=3, max_retries=2, **authorize_kwargs):
+        """ Initializes the flow.
+
+        :param client: Flinks client used to perform the calls
+        :param answer_store: store used to answer security challenges
+        :param max_rounds: maximum number of challenge rounds before failing
+        :param max_retries:
+            maximum number of times a call failing because of a transient error should be performed
+            again (calls carrying credentials or security responses are never performed again)
+        :param authorize_kwargs: keyword arguments passed to the first ``authorize`` call
+        :type client: flinks.client.Client
+        :type answer_store: flinks.mfa.MemoryAnswerStore
+        :type max_rounds: int
+        :type max_retries: int
+
+        """
+        self.client = client
+        self.answer_store = answer_store if answer_store is not None else MemoryAnswerStore()
+        self.max_rounds = max_rounds
+        self.max_retries = max_retries
+        self.authorize_kwargs = authorize_kwargs
+        self.state = self.STARTED
+        self.response = None
+        self.request_id = None
+        self.login_id = authorize_kwargs.get('login_id')
+        self.challenges = []
+        self.error = None
+        self.calls = 0
+        self._rounds = 0
+        self._fetched_stored_answers = False
+
+    @property
+    def done(self):
+        """ Returns a boolean indicating whether the flow reached a final state. """
+        return self.state in (self.AUTHORIZED, self.FAILED)
+
+    def run(self):
+        """ Runs the flow until it reaches a final state; returns the flow. """
+        while not self.done:
+            self.step()
+        return self
+
+    def step(self):
+        """ Performs the next transition of the flow. """
+        try:
+            if self.state == self.STARTED:
+                retry = not any(
+                    self.authorize_kwargs.get(name)
+                    for name in ('username', 'password', 'security_responses')
+                )
+                self._handle(self._perform('authorize', retry=retry, **self.authorize_kwargs))
+            elif self.state == self.CHALLENGED:
+                self._answer_challenges()
+        except FlinksError as e:
+            self._fail(e)
+
+    def _answer_challenges(self):
+        self._rounds += 1
+        if self._rounds > self.max_rounds:
+            return self._fail(FlinksError('Too many security challenge rounds'))
+
+        security_responses = self._get_security_responses()
+        if security_responses is None and self.login_id and not self._fetched_stored_answers:
+            # The answers stored on the Flinks side are only retrieved when needed.
+            self._fetched_stored_answers = True
+            stored = self._perform('get_mfa_questions', self.login_id, retry=True)
+            for question in stored.get('Questions') or []:
+                if question.get('Question') and question.get('Answer') is not None:
+                    self.answer_store.set(self.login_id, question['Question'], question['Answer'])
+            security_responses = self._get_security_responses()
+        if security_responses is None:
+            return self._fail(FlinksError('Unable to answer the security challenges'))
+
+        self._handle(self._perform(
+            'authorize', request_id=self.request_id, login_id=self.login_id,
+            security_responses=security_responses, retry=False,
+        ))
+
+    def _get_security_responses(self):
+        responses = {}
+        for challenge in self.challenges:
+            prompt = challenge.get('Prompt')
+            answer = self.answer_store.get(self.login_id, prompt) if prompt else None
+            if answer is None:
+                return None
+            responses[prompt] = answer if isinstance(answer, list) else [answer]
+        return responses
+
+    def _handle(self, response_data):
+        self.response = response_data
+        self.request_id = response_data.get('RequestId') or self.request_id
+        login = response_data.get('Login')
+        if isinstance(login, dict) and login.get('Id'):
+            self.login_id = login['Id']
+        challenged = response_data.get('HttpStatusCode', 200) == 203
+        if challenged or response_data.get('SecurityChallenges'):
+            self.challenges = response_data.get('SecurityChallenges') or []
+            self.state = self.CHALLENGED
+        elif self.request_id:
+            self.challenges = []
+            self.state = self.AUTHORIZED
+        else:
+            self._fail(FlinksError('No RequestId in the authorization response'))
+
+    def _fail(self, error):
+        self.error = error
+        self.state = self.FAILED
+
+    def _perform(self, operation, *args, retry=False, **kwargs):
+        attempt = 0
+        while True:
+            self.calls += 1
+            try:
+                return getattr(self.client.banking_services, operation)(*args, **kwargs)
+            except CircuitOpenError:
+                raise
+            except (TransportError, RequestException) as e:
+                status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+                transient = status_code is None or status_code >= 500
+                if not retry or not transient or attempt >= self.max_retries:
+                    if isinstance(e, FlinksError):
+                        raise
+                    raise TransportError(str(e), response=None)
+                attempt += 1
+
+
+class MfaDriver:
+    """ Runs many authorization flows concurrently. """
+
+    def __init__(self, client, answer_store=None, max_workers=8, **flow_kwargs):
+        """ Initializes the driver.
+
+        :param client: Flinks client used to perform the calls
+        :param answer_store: store used to answer security challenges
+        :param max_workers: maximum number of flows that can run concurrently
+        :param flow_kwargs: keyword arguments passed to each ``AuthorizeFlow``
+        :type client: flinks.client.Client
+        :type answer_store: flinks.mfa.MemoryAnswerStore
+        :type max_workers: int
+
+        """
+        self.client = client
+        self.answer_store = answer_store if answer_store is not None else MemoryAnswerStore()
+        self.max_workers = max_workers
+        self.flow_kwargs = flow_kwargs
+
+    def run(self, authorizations):
+        """ Runs the flows; returns the list of finished ``AuthorizeFlow`` objects.
+
+        :param authorizations: iterable of dictionaries of ``authorize`` keyword arguments
+        :type authorizations: iterable
+        :return: list of finished flows (in the order of the authorizations)
+        :rtype: list
+
+        """
+        flows = [
+            AuthorizeFlow(
+                self.client, answer_store=self.answer_store,
+                **dict(self.flow_kwargs, **authorize_kwargs)
+            )
+            for authorize_kwargs in authorizations
+        ]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(AuthorizeFlow.run, flows))
+
+
+def _normalize(question):
+    return ' '.join(question.split()).lower()
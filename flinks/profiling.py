@@ -0,0 +1,210 @@
+"""
+    Flinks client profiling
+    =======================
+
+    This module defines the ``Profiler`` class allowing to attribute the CPU time, the wall time and
+    the memory allocated by the calls performed by a client to the considered endpoints and response
+    sizes. Only a fraction of the calls can be profiled (``sample_rate``) in order to keep the
+    overhead low in production. Stacks of the profiled calls can also be sampled periodically and
+    dumped using the "collapsed stacks" format used by flamegraph tools.
+
+    Memory attribution relies on ``tracemalloc``, whose counters are global to the process: memory
+    allocated by other threads while a call is being profiled is attributed to this call. The
+    recorded memory is the peak of the memory allocated during the call on Python 3.9+ (where
+    ``tracemalloc.reset_peak`` is available; concurrent profiled calls reset the peak of each other,
+    which may lead to underestimations) and the memory still allocated at the end of the call (ie.
+    retained memory, which ignores temporary allocations) on older versions; ``memory_metric``
+    indicates which one is used. Tracing slows down every allocation of the process (not only the
+    ones of the sampled calls), so it should only be enabled for a limited period of time in
+    production (see ``memory_window``).
+
+    CPU times are measured per thread using ``time.thread_time`` on Python 3.7+. Older versions
+    fall back to ``time.process_time``: each call is then charged the CPU time consumed by all the
+    threads of the process while it was being performed.
+
+"""
+
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+_thread_time = getattr(time, 'thread_time', time.process_time)
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+class Profiler:
+    """ Records per-endpoint CPU, wall time and memory statistics for client calls. """
+
+    memory_metric = 'peak' if _reset_peak is not None else 'retained'
+
+    def __init__(
+        self, sample_rate=1.0, trace_memory=False, stack_interval=None, memory_window=None,
+        clock=None,
+    ):
+        """ Initializes the profiler.
+
+        :param sample_rate: fraction of the calls to profile (between 0 and 1)
+        :param trace_memory:
+            whether to record the memory allocated by calls (using tracemalloc); note that this
+            slows down all the allocations of the process, regardless of the sample rate
+        :param stack_interval:
+            number of seconds between two samples of the stacks of the profiled calls (stacks are
+            not sampled if not provided)
+        :param memory_window:
+            number of seconds after which memory tracing is stopped (memory is traced until
+            ``stop()`` is called if not provided)
+        :param clock: callable returning the current time in seconds (defaults to a monotonic clock)
+        :type sample_rate: float
+        :type trace_memory: bool
+        :type stack_interval: float
+        :type memory_window: int or float
+        :type clock: callable
+
+        """
+        self.sample_rate = sample_rate
+        self.trace_memory = trace_memory
+        self.stack_interval = stack_interval
+        self.clock = clock or time.monotonic
+        self.stacks = Counter()
+        self._stats = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stopped = threading.Event()
+        # Tracing is only stopped by the profiler if it was started by the profiler.
+        self._started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._memory_deadline = (
+            self.clock() + memory_window if trace_memory and memory_window is not None else None
+        )
+        if stack_interval:
+            self._sampler = threading.Thread(target=self._sample_stacks, daemon=True)
+            self._sampler.start()
+
+    def should_sample(self):
+        """ Returns a boolean indicating whether the next call should be profiled. """
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    @contextmanager
+    def record(self, endpoint):
+        """ Profiles the block; the yielded dictionary can receive the ``response_size``. """
+        call = {'response_size': 0}
+        thread_id = threading.get_ident()
+        self._active[thread_id] = endpoint
+        if self._memory_deadline is not None and self.clock() >= self._memory_deadline:
+            self._stop_tracing()
+        trace_memory = self.trace_memory
+        if trace_memory and _reset_peak is not None:
+            _reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+        cpu_before = _thread_time()
+        wall_before = time.perf_counter()
+        try:
+            yield call
+        finally:
+            wall = time.perf_counter() - wall_before
+            cpu = _thread_time() - cpu_before
+            memory = 0
+            if trace_memory and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                memory = max((peak if _reset_peak is not None else current) - memory_before, 0)
+            self._active.pop(thread_id, None)
+            self._add(endpoint, _size_bucket(call['response_size']), cpu, wall, memory)
+
+    def summary(self):
+        """ Returns a list of dictionaries of statistics per endpoint and response size bucket.
+
+        Each dictionary contains the ``endpoint``, the upper bound of the response size bucket
+        (``response_size``, in bytes), the number of profiled ``calls`` and the total and maximum
+        CPU time, wall time (in seconds) and allocated memory (in bytes; see ``memory_metric``).
+
+        """
+        with self._lock:
+            items = sorted(self._stats.items())
+        return [dict(stats, endpoint=key[0], response_size=key[1]) for key, stats in items]
+
+    def report(self):
+        """ Returns a human-readable report of the statistics. """
+        lines = ['{:<45} {:>10} {:>7} {:>10} {:>10} {:>12}'.format(
+            'endpoint', 'size<=', 'calls', 'cpu avg', 'wall avg', self.memory_metric + ' avg',
+        )]
+        for stats in self.summary():
+            lines.append('{:<45} {:>10} {:>7} {:>9.1f}ms {:>9.1f}ms {:>11.0f}B'.format(
+                stats['endpoint'], stats['response_size'], stats['calls'],
+                stats['cpu'] / stats['calls'] * 1000, stats['wall'] / stats['calls'] * 1000,
+                stats['memory'] / stats['calls'],
+            ))
+        return '\n'.join(lines)
+
+    def dump_stacks(self, path):
+        """ Writes the sampled stacks to a file using the collapsed stacks format. """
+        with self._lock:
+            stacks = sorted(self.stacks.items())
+        with open(path, 'w') as f:
+            for stack, count in stacks:
+                f.write('{} {}\n'.format(stack, count))
+
+    def reset(self):
+        """ Forgets all the recorded statistics and stacks. """
+        with self._lock:
+            self._stats.clear()
+            self.stacks.clear()
+
+    def stop(self):
+        """ Stops sampling stacks (and tracing memory allocations if it was started here). """
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+        self._stop_tracing()
+
+    def _stop_tracing(self):
+        with self._lock:
+            self.trace_memory = False
+            self._memory_deadline = None
+            started_tracing, self._started_tracing = self._started_tracing, False
+        if started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _add(self, endpoint, size_bucket, cpu, wall, memory):
+        with self._lock:
+            stats = self._stats.get((endpoint, size_bucket))
+            if stats is None:
+                stats = self._stats[(endpoint, size_bucket)] = {
+                    'calls': 0, 'cpu': 0, 'cpu_max': 0, 'wall': 0, 'wall_max': 0, 'memory': 0,
+                    'memory_max': 0,
+                }
+            stats['calls'] += 1
+            for name, value in (('cpu', cpu), ('wall', wall), ('memory', memory)):
+                stats[name] += value
+                stats[name + '_max'] = max(stats[name + '_max'], value)
+
+    def _sample_stacks(self):
+        while not self._stopped.wait(self.stack_interval):
+            active = dict(self._active)
+            if not active:
+                continue
+            frames = sys._current_frames()
+            samples = []
+            for thread_id, endpoint in active.items():
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{}:{}'.format(code.co_filename, code.co_name))
+                    frame = frame.f_back
+                stack.append(endpoint)
+                samples.append(';'.join(reversed(stack)))
+            with self._lock:
+                self.stacks.update(samples)
+
+
+def _size_bucket(size):
+    """ Returns the smallest power of two greater than or equal to the size. """
+    return 1 << max(size - 1, 0).bit_length() if size else 0
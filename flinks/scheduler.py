@@ -0,0 +1,144 @@
+"""
+    Flinks request scheduler
+    ========================
+
+    This module defines the ``RequestScheduler`` class allowing to limit the number of concurrent
+    calls performed by a client while admitting pending calls according to their priority. Calls
+    whose deadline has passed are dropped before being sent to the Flinks service.
+
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+from .exceptions import DeadlineExceededError
+
+
+class RequestScheduler:
+    """ Admits API calls in priority order while limiting the number of concurrent calls. """
+
+    HIGH = 0
+    NORMAL = 10
+    LOW = 20
+
+    def __init__(self, max_concurrency=10, clock=None):
+        """ Initializes the scheduler.
+
+        :param max_concurrency:
+            maximum number of calls that can be performed concurrently; this should usually match
+            the size of the connection pool of the client
+        :param clock: callable returning the current time in seconds (defaults to a monotonic clock)
+        :type max_concurrency: int
+        :type clock: callable
+
+        """
+        self.max_concurrency = max_concurrency
+        self.clock = clock or time.monotonic
+        self.dropped = 0
+        self._active = 0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def active(self):
+        """ Returns the number of calls that are currently being performed. """
+        return self._active
+
+    @property
+    def pending(self):
+        """ Returns the number of calls that are waiting to be admitted. """
+        return len(self._waiters)
+
+    @contextmanager
+    def context(self, priority=None, timeout=None, deadline=None):
+        """ Defines the priority and the deadline of the calls performed in the current thread.
+
+        :param priority: priority of the calls (lower values are admitted first)
+        :param timeout: number of seconds after which the calls should be dropped
+        :param deadline: time (as returned by the scheduler clock) after which calls are dropped
+        :type priority: int
+        :type timeout: int or float
+        :type deadline: int or float
+
+        """
+        if timeout is not None:
+            timeout_deadline = self.clock() + timeout
+            deadline = timeout_deadline if deadline is None else min(deadline, timeout_deadline)
+        previous = self.settings()
+        self._local.settings = (
+            previous[0] if priority is None else priority,
+            previous[1] if deadline is None else deadline,
+        )
+        try:
+            yield self
+        finally:
+            self._local.settings = previous
+
+    def settings(self):
+        """ Returns the ``(priority, deadline)`` tuple defined for the current thread.
+
+        Calls performed in other threads on behalf of the current one (eg. duplicate requests or
+        windowed fetches) can pass these settings to ``slot()`` or ``context()``.
+
+        """
+        return getattr(self._local, 'settings', (self.NORMAL, None))
+
+    @contextmanager
+    def slot(self, priority=None, deadline=None):
+        """ Waits until a call can be performed and holds the related slot until the block exits.
+
+        The priority and the deadline default to the ones defined using ``context()`` in the
+        current thread. A ``DeadlineExceededError`` is raised if the deadline passes before the
+        call can be admitted.
+
+        """
+        self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, priority=None, deadline=None):
+        """ Waits for a free slot; see ``slot()``. """
+        default_priority, default_deadline = self.settings()
+        priority = default_priority if priority is None else priority
+        deadline = default_deadline if deadline is None else deadline
+
+        with self._condition:
+            self._check_deadline(deadline)
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                return
+
+            entry = (priority, next(self._counter))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while self._waiters[0] != entry or self._active >= self.max_concurrency:
+                    remaining = None if deadline is None else deadline - self.clock()
+                    self._check_deadline(deadline)
+                    self._condition.wait(remaining)
+                    self._check_deadline(deadline)
+            except DeadlineExceededError:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiters)
+            self._active += 1
+            self._condition.notify_all()
+
+    def release(self):
+        """ Releases a slot that was previously acquired. """
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    def _check_deadline(self, deadline):
+        if deadline is not None and self.clock() >= deadline:
+            self.dropped += 1
+            raise DeadlineExceededError('The deadline of the request has passed')
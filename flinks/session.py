@@ -0,0 +1,79 @@
+"""
+    Flinks HTTP session
+    ===================
+
+    This module defines the ``Session`` class, a ``requests.Session`` whose ``request`` method
+    reuses per-host request templates. By default, ``requests`` merges the session settings with
+    the environment (proxies, CA bundles, netrc credentials, ...) for every single request; these
+    settings are computed once per scheme, host and session settings (proxies, TLS settings, ...)
+    here, so that changes made to the session settings still apply. Requests using options that are
+    not covered by the templates (or sessions holding cookies, credentials or hooks) fall back to
+    the regular ``requests`` implementation.
+
+"""
+
+from urllib.parse import urlsplit
+
+import requests
+from requests.cookies import RequestsCookieJar
+from requests.hooks import default_hooks
+from requests.models import PreparedRequest
+from requests.sessions import merge_setting
+from requests.utils import get_netrc_auth
+
+
+class Session(requests.Session):
+    """ A ``requests.Session`` caching the settings used to prepare and send requests. """
+
+    def __init__(self):
+        super().__init__()
+        self._templates = {}
+
+    def request(
+        self, method, url, params=None, data=None, headers=None, cookies=None, files=None,
+        auth=None, timeout=None, allow_redirects=True, proxies=None, hooks=None, stream=None,
+        verify=None, cert=None, json=None,
+    ):
+        """ Sends a request; see ``requests.Session.request``. """
+        if (
+            cookies or files or auth or proxies or hooks or stream is not None or
+            verify is not None or cert is not None or isinstance(url, bytes) or
+            self.cookies or self.auth is not None or any(self.hooks.values())
+        ):
+            return super().request(
+                method, url, params=params, data=data, headers=headers, cookies=cookies,
+                files=files, auth=auth, timeout=timeout, allow_redirects=allow_redirects,
+                proxies=proxies, hooks=hooks, stream=stream, verify=verify, cert=cert, json=json,
+            )
+
+        template_auth, send_kwargs = self._get_template(url)
+        prepared = PreparedRequest()
+        prepared.prepare_method(method)
+        prepared.prepare_url(url, merge_setting(params, self.params))
+        prepared.prepare_headers(
+            self.headers if not headers else merge_setting(headers, self.headers),
+        )
+        prepared._cookies = RequestsCookieJar()
+        prepared.prepare_body(data, None, json)
+        prepared.prepare_auth(template_auth, url)
+        prepared.hooks = default_hooks()
+        return self.send(prepared, timeout=timeout, allow_redirects=allow_redirects, **send_kwargs)
+
+    def clear_templates(self):
+        """ Forgets the cached templates (eg. after changing the environment or the settings). """
+        self._templates.clear()
+
+    def _get_template(self, url):
+        parts = urlsplit(url)
+        key = (
+            parts.scheme, parts.netloc, tuple(sorted(self.proxies.items())), self.verify,
+            tuple(self.cert) if isinstance(self.cert, list) else self.cert, self.stream,
+            self.trust_env,
+        )
+        template = self._templates.get(key)
+        if template is None:
+            base_url = '{}://{}/'.format(parts.scheme, parts.netloc)
+            template_auth = get_netrc_auth(base_url) if self.trust_env else None
+            send_kwargs = self.merge_environment_settings(base_url, {}, None, None, None)
+            template = self._templates[key] = (template_auth, send_kwargs)
+        return template
@@ -0,0 +1,31 @@
+"""
+    Flinks SQLite helpers
+    =====================
+
+    This module defines helpers shared by the components storing their state in a local SQLite
+    database (eg. RequestId caches or fingerprint stores).
+
+"""
+
+import sqlite3
+
+
+def connect(path, timeout=5):
+    """ Returns a ``ClosingConnection`` to the SQLite database stored at the given path. """
+    return ClosingConnection(sqlite3.connect(path, timeout=timeout))
+
+
+class ClosingConnection:
+    """ Commits (or rolls back) and closes a SQLite connection when exiting a ``with`` block. """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def __enter__(self):
+        return self._connection.__enter__()
+
+    def __exit__(self, *args):
+        try:
+            return self._connection.__exit__(*args)
+        finally:
+            self._connection.close()
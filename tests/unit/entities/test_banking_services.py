@@ -1,7 +1,12 @@
 import datetime as dt
 import unittest.mock
 
+import pytest
+from requests.exceptions import HTTPError
+
 from flinks import Client
+from flinks.exceptions import TransportError
+from flinks.scheduler import RequestScheduler
 
 
 class TestBankingServices:
@@ -294,6 +299,131 @@ class TestBankingServices:
             'AccountsFilter': ['acc-1234', ],
         }
 
+    @unittest.mock.patch('requests.Session.post')
+    def test_can_return_accounts_details_over_monthly_windows(self, mocked_post):
+        def _post(url, json, **kwargs):
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            mocked_response.json.return_value = {
+                'Accounts': [
+                    {
+                        'Id': 'acc-1234',
+                        'Transactions': [
+                            {'Id': 'tx-boundary', 'Date': '2017-01-31'},
+                            {'Id': 'tx-' + json['DateFrom'], 'Date': json['DateFrom']},
+                        ],
+                    },
+                ],
+            }
+            return mocked_response
+
+        mocked_post.side_effect = _post
+
+        client = Client('foo-12345', 'https://username.flinks-custom.io')
+        results = list(client.banking_services.iter_accounts_detail_windows(
+            'request-1234', dt.date(2017, 1, 15), '2017-03-10',
+        ))
+
+        assert [(window_from, window_to) for window_from, window_to, _ in results] == [
+            (dt.date(2017, 1, 15), dt.date(2017, 1, 31)),
+            (dt.date(2017, 2, 1), dt.date(2017, 2, 28)),
+            (dt.date(2017, 3, 1), dt.date(2017, 3, 10)),
+        ]
+        assert [
+            [tx['Id'] for tx in response_data['Accounts'][0]['Transactions']]
+            for _, _, response_data in results
+        ] == [
+            ['tx-boundary', 'tx-2017-01-15'],
+            ['tx-2017-02-01'],
+            ['tx-2017-03-01'],
+        ]
+        assert sorted(call[1]['json']['DateTo'] for call in mocked_post.call_args_list) == [
+            '2017-01-31', '2017-02-28', '2017-03-10',
+        ]
+        assert all(call[1]['json']['WithTransactions'] for call in mocked_post.call_args_list)
+
+    @pytest.mark.parametrize('window_days', [0, -7])
+    def test_rejects_invalid_window_sizes_when_retrieving_accounts_details(self, window_days):
+        client = Client('foo-12345', 'https://username.flinks-custom.io')
+        with pytest.raises(ValueError):
+            list(client.banking_services.iter_accounts_detail_windows(
+                'request-1234', dt.date(2017, 1, 1), dt.date(2017, 1, 21), window_days=window_days,
+            ))
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_retries_only_the_failed_windows_when_retrieving_accounts_details(self, mocked_post):
+        failures = {'2017-01-08': 1}
+
+        def _post(url, json, **kwargs):
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            mocked_response.json.return_value = {'Accounts': [], }
+            if failures.get(json['DateFrom']):
+                failures[json['DateFrom']] -= 1
+                mocked_response.status_code = 503
+                mocked_response.raise_for_status.side_effect = HTTPError(
+                    response=mocked_response,
+                )
+            return mocked_response
+
+        mocked_post.side_effect = _post
+
+        client = Client('foo-12345', 'https://username.flinks-custom.io')
+        results = list(client.banking_services.iter_accounts_detail_windows(
+            'request-1234', dt.date(2017, 1, 1), dt.date(2017, 1, 21), window_days=7,
+            retry_backoff=0,
+        ))
+
+        assert len(results) == 3
+        assert sorted(call[1]['json']['DateFrom'] for call in mocked_post.call_args_list) == [
+            '2017-01-01', '2017-01-08', '2017-01-08', '2017-01-15',
+        ]
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_raises_if_a_window_keeps_failing_when_retrieving_accounts_details(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=503, content='ERROR')
+        mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_post.return_value = mocked_response
+
+        client = Client('foo-12345', 'https://username.flinks-custom.io')
+        with pytest.raises(TransportError):
+            list(client.banking_services.iter_accounts_detail_windows(
+                'request-1234', dt.date(2017, 1, 1), dt.date(2017, 1, 5), max_retries=1,
+                retry_backoff=0,
+            ))
+        assert mocked_post.call_count == 2
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_retry_windows_failing_because_of_client_errors(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=401, content='ERROR')
+        mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_post.return_value = mocked_response
+
+        client = Client('foo-12345', 'https://username.flinks-custom.io')
+        with pytest.raises(TransportError):
+            list(client.banking_services.iter_accounts_detail_windows(
+                'request-1234', dt.date(2017, 1, 1), dt.date(2017, 1, 5), retry_backoff=0,
+            ))
+        assert mocked_post.call_count == 1
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_applies_the_scheduler_settings_of_the_caller_to_the_windows(self, mocked_post):
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io', scheduler=RequestScheduler(),
+        )
+        settings = []
+
+        def _post(url, json, **kwargs):
+            settings.append(client.scheduler.settings())
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            mocked_response.json.return_value = {'Accounts': [], }
+            return mocked_response
+
+        mocked_post.side_effect = _post
+        with client.scheduler.context(priority=RequestScheduler.HIGH, deadline=1e12):
+            list(client.banking_services.iter_accounts_detail_windows(
+                'request-1234', dt.date(2017, 1, 1), dt.date(2017, 1, 21), window_days=7,
+            ))
+        assert settings == [(RequestScheduler.HIGH, 1e12)] * 3
+
     @unittest.mock.patch('requests.Session.get')
     def test_can_initiate_account_detail_retrieval_in_async_mode(self, mocked_get):
         mocked_response = unittest.mock.Mock(status_code=200, content='{}')
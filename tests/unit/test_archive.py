@@ -0,0 +1,107 @@
+import datetime as dt
+
+import pytest
+
+from flinks.archive import MISSING, TransactionArchive, write_archive
+from flinks.exceptions import ArchiveError
+
+
+RESPONSES = [
+    {
+        'Login': {'Id': 'login-1'},
+        'Accounts': [
+            {
+                'Id': 'acc-1',
+                'Transactions': [
+                    {
+                        'Id': 'tx-1', 'Date': '2017/01/02', 'Description': 'Coffee',
+                        'Debit': 3.5, 'Credit': None, 'Balance': 96.5,
+                    },
+                    {
+                        'Id': 'tx-2', 'Date': '2017-01-03', 'Description': 'Payroll',
+                        'Debit': None, 'Credit': 1000, 'Balance': None, 'Category': 'Income',
+                    },
+                ],
+            },
+        ],
+    },
+    {
+        'Login': {'Id': 'login-2'},
+        'Accounts': [
+            {
+                'Id': 'acc-2',
+                'Transactions': [
+                    {'Id': 'tx-3', 'Date': '2017-02-01', 'Description': 'Coffee', 'Debit': 2},
+                ],
+            },
+        ],
+    },
+]
+
+
+class TestTransactionArchive:
+    def test_can_write_and_read_back_transactions(self, tmpdir):
+        path = str(tmpdir.join('transactions.flka'))
+        assert write_archive(path, RESPONSES) == 3
+
+        with TransactionArchive(path) as archive:
+            assert len(archive) == 3
+            assert list(archive.amounts) == [-350, 100000, -200]
+            assert list(archive.balances) == [9650, MISSING, MISSING]
+            assert archive.date(0) == dt.date(2017, 1, 2)
+            assert archive.descriptions[0] == archive.descriptions[2]
+            assert archive.string(archive.accounts[2]) == 'acc-2'
+            assert list(archive)[1] == {
+                'LoginId': 'login-1',
+                'AccountId': 'acc-1',
+                'Id': 'tx-2',
+                'Date': dt.date(2017, 1, 3),
+                'Amount': 1000.0,
+                'Balance': None,
+                'Description': 'Payroll',
+                'Category': 'Income',
+            }
+
+    def test_exposes_columns_as_memory_views(self, tmpdir):
+        path = str(tmpdir.join('transactions.flka'))
+        write_archive(path, RESPONSES)
+
+        with TransactionArchive(path) as archive:
+            assert isinstance(archive.dates, memoryview)
+            assert archive.dates.format == 'i'
+            assert archive.amounts.format == 'q'
+            assert archive.amounts.readonly
+
+    def test_can_be_closed_while_slices_of_its_columns_are_alive(self, tmpdir):
+        path = str(tmpdir.join('transactions.flka'))
+        write_archive(path, RESPONSES)
+
+        with TransactionArchive(path) as archive:
+            amounts = archive.amounts[0:2]
+            exported = memoryview(archive.dates)
+        assert list(amounts) == [-350, 100000]
+        assert len(exported) == 3
+
+    def test_can_write_an_empty_archive(self, tmpdir):
+        path = str(tmpdir.join('transactions.flka'))
+        assert write_archive(path, []) == 0
+
+        with TransactionArchive(path) as archive:
+            assert len(archive) == 0
+            assert list(archive) == []
+
+    def test_raises_if_the_file_is_not_an_archive(self, tmpdir):
+        path = tmpdir.join('transactions.flka')
+        path.write_binary(b'NOPE' + b'\0' * 64)
+        with pytest.raises(ArchiveError):
+            TransactionArchive(str(path))
+
+    def test_raises_if_the_file_is_truncated(self, tmpdir):
+        path = str(tmpdir.join('transactions.flka'))
+        write_archive(path, RESPONSES)
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-8])
+        with pytest.raises(ArchiveError):
+            TransactionArchive(path)
@@ -0,0 +1,173 @@
+import unittest.mock
+
+import pytest
+from requests.exceptions import HTTPError
+
+from flinks import Client
+from flinks.cache import BaseRequestIdCache, MemoryRequestIdCache, SqliteRequestIdCache
+from flinks.exceptions import ProtocolError, TransportError
+
+
+AUTHORIZE_RESPONSE = {
+    'HttpStatusCode': 200,
+    'Login': {'Id': 'login-1234'},
+    'Institution': 'FlinksCapital',
+    'RequestId': 'request-1234',
+}
+CACHED_RESPONSE = {
+    'HttpStatusCode': 200,
+    'Login': {'Id': 'login-1234'},
+    'RequestId': 'request-1234',
+}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmpdir):
+    def _make_cache(**kwargs):
+        if request.param == 'memory':
+            return MemoryRequestIdCache(**kwargs)
+        return SqliteRequestIdCache(str(tmpdir.join('cache.sqlite3')), **kwargs)
+    return _make_cache
+
+
+class TestRequestIdCache:
+    def test_can_return_a_cached_authorization_response(self, make_cache):
+        cache = make_cache()
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        assert cache.get('login-1234') == CACHED_RESPONSE
+        assert cache.get('login-5678') is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_does_not_return_expired_authorization_responses(self, make_cache, clock):
+        cache = make_cache(ttl=60, clock=clock)
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        clock.now += 59
+        assert cache.get('login-1234') == CACHED_RESPONSE
+        clock.now += 1
+        assert cache.get('login-1234') is None
+
+    def test_can_delete_cached_authorization_responses(self, make_cache):
+        cache = make_cache()
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        cache.set('login-5678', AUTHORIZE_RESPONSE)
+        cache.delete('login-1234')
+        assert cache.get('login-1234') is None
+        cache.clear()
+        assert cache.get('login-5678') is None
+
+    def test_only_caches_the_fields_needed_to_use_the_request_id(self, make_cache):
+        cache = make_cache()
+        cache.set('login-1234', dict(
+            AUTHORIZE_RESPONSE, Login={'Id': 'login-1234', 'Username': 'jdoe'},
+        ))
+        assert cache.get('login-1234') == CACHED_RESPONSE
+
+    def test_can_delete_cached_authorization_responses_using_their_request_id(self, make_cache):
+        cache = make_cache()
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        cache.set('login-5678', dict(AUTHORIZE_RESPONSE, RequestId='request-5678'))
+        cache.delete_request_id('request-1234')
+        assert cache.get('login-1234') is None
+        assert cache.get('login-5678')['RequestId'] == 'request-5678'
+
+    def test_cannot_create_caches_that_do_not_implement_the_storage_methods(self):
+        class IncompleteRequestIdCache(BaseRequestIdCache):
+            def _get(self, login_id, now):
+                return None
+
+        with pytest.raises(TypeError):
+            IncompleteRequestIdCache()
+
+    def test_sqlite_caches_can_be_shared(self, tmpdir):
+        path = str(tmpdir.join('cache.sqlite3'))
+        SqliteRequestIdCache(path).set('login-1234', AUTHORIZE_RESPONSE)
+        assert SqliteRequestIdCache(path).get('login-1234') == CACHED_RESPONSE
+
+
+class TestClientWithRequestIdCache:
+    @unittest.mock.patch('requests.Session.post')
+    def test_reuses_the_request_id_of_a_previous_authorization(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = AUTHORIZE_RESPONSE
+        mocked_post.return_value = mocked_response
+
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            request_id_cache=MemoryRequestIdCache(),
+        )
+        for _ in range(2):
+            response_data = client.banking_services.authorize(
+                login_id='login-1234', most_recent_cached=True,
+            )
+            assert response_data['RequestId'] == 'request-1234'
+        assert mocked_post.call_count == 1
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_reuse_request_ids_for_live_authorizations(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = AUTHORIZE_RESPONSE
+        mocked_post.return_value = mocked_response
+
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            request_id_cache=MemoryRequestIdCache(),
+        )
+        for _ in range(2):
+            client.banking_services.authorize(login_id='login-1234')
+        assert mocked_post.call_count == 2
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_cache_authorizations_requiring_security_responses(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=203, content='{}')
+        mocked_response.json.return_value = {
+            'HttpStatusCode': 203, 'RequestId': 'request-1234', 'SecurityChallenges': [],
+        }
+        mocked_post.return_value = mocked_response
+
+        cache = MemoryRequestIdCache()
+        client = Client('foo-12345', 'https://username.flinks-custom.io', request_id_cache=cache)
+        client.banking_services.authorize(login_id='login-1234', most_recent_cached=True)
+        assert cache.get('login-1234') is None
+
+    @unittest.mock.patch('requests.Session.delete')
+    def test_forgets_the_request_id_of_a_deleted_card(self, mocked_delete):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = {'Result': 'OK'}
+        mocked_delete.return_value = mocked_response
+
+        cache = MemoryRequestIdCache()
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        client = Client('foo-12345', 'https://username.flinks-custom.io', request_id_cache=cache)
+        client.banking_services.delete_card('login-1234')
+        assert cache.get('login-1234') is None
+
+    @pytest.mark.parametrize('status_code,error', [(400, ProtocolError), (401, TransportError)])
+    @unittest.mock.patch('requests.Session.post')
+    def test_forgets_request_ids_rejected_by_the_flinks_service(
+        self, mocked_post, status_code, error,
+    ):
+        mocked_response = unittest.mock.Mock(status_code=status_code, content='{}')
+        mocked_response.json.return_value = {'FlinksCode': 'SESSION_EXPIRED'}
+        if status_code != 400:
+            mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_post.return_value = mocked_response
+
+        cache = MemoryRequestIdCache()
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        client = Client('foo-12345', 'https://username.flinks-custom.io', request_id_cache=cache)
+        with pytest.raises(error):
+            client.banking_services.get_accounts_summary('request-1234')
+        assert cache.get('login-1234') is None
+
+    @unittest.mock.patch('requests.Session.get')
+    def test_keeps_request_ids_when_calls_fail_because_of_server_errors(self, mocked_get):
+        mocked_response = unittest.mock.Mock(status_code=503, content='ERROR')
+        mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_get.return_value = mocked_response
+
+        cache = MemoryRequestIdCache()
+        cache.set('login-1234', AUTHORIZE_RESPONSE)
+        client = Client('foo-12345', 'https://username.flinks-custom.io', request_id_cache=cache)
+        with pytest.raises(TransportError):
+            client.banking_services.get_accounts_detail_async('request-1234')
+        assert cache.get('login-1234') == CACHED_RESPONSE
@@ -0,0 +1,112 @@
+import unittest.mock
+
+import pytest
+
+from flinks import Client
+from flinks.changes import (ChangeDetector, MemoryFingerprintStore, SqliteFingerprintStore,
+                            fingerprint)
+
+
+SUMMARY = {
+    'Accounts': [
+        {'Id': 'acc-1', 'Balance': {'Current': 100}, 'Title': 'Chequing'},
+        {'Id': 'acc-2', 'Balance': {'Current': 50}, 'Title': 'Savings'},
+    ],
+}
+
+
+class TestFingerprint:
+    def test_does_not_depend_on_the_order_of_accounts_or_irrelevant_fields(self):
+        reordered = {
+            'Accounts': [
+                {'Id': 'acc-2', 'Balance': {'Current': 50}, 'Title': 'Savings (renamed)'},
+                {'Id': 'acc-1', 'Balance': {'Current': 100}},
+            ],
+            'RequestId': 'request-5678',
+        }
+        assert fingerprint(reordered) == fingerprint(SUMMARY)
+
+    def test_changes_when_a_balance_changes(self):
+        changed = {'Accounts': [dict(SUMMARY['Accounts'][0], Balance={'Current': 99})]}
+        changed['Accounts'].append(SUMMARY['Accounts'][1])
+        assert fingerprint(changed) != fingerprint(SUMMARY)
+
+    def test_changes_when_an_account_is_added(self):
+        changed = {'Accounts': SUMMARY['Accounts'] + [{'Id': 'acc-3'}]}
+        assert fingerprint(changed) != fingerprint(SUMMARY)
+
+    def test_changes_when_the_last_transaction_changes(self):
+        first = {'Accounts': [{'Id': 'acc-1', 'Transactions': [{'Id': 'tx-1'}]}]}
+        second = {'Accounts': [{'Id': 'acc-1', 'Transactions': [{'Id': 'tx-2'}]}]}
+        assert fingerprint(first) != fingerprint(second)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmpdir):
+    if request.param == 'memory':
+        return MemoryFingerprintStore()
+    return SqliteFingerprintStore(str(tmpdir.join('fingerprints.sqlite3')))
+
+
+class TestChangeDetector:
+    @unittest.mock.patch('requests.Session.post')
+    def test_only_fetches_account_details_when_the_summary_changes(self, mocked_post, store):
+        summaries = [SUMMARY, SUMMARY, {'Accounts': []}]
+
+        def _post(url, json, **kwargs):
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            if url.endswith('/GetAccountsSummary'):
+                mocked_response.json.return_value = summaries.pop(0)
+            else:
+                mocked_response.json.return_value = {'Accounts': [], 'Detail': True}
+            return mocked_response
+
+        mocked_post.side_effect = _post
+        detector = ChangeDetector(Client('foo-12345', 'https://username.flinks-custom.io'), store)
+
+        assert detector.refresh('login-1', 'request-1', with_transactions=True)['Detail']
+        assert detector.refresh('login-1', 'request-2', with_transactions=True) is None
+        assert detector.refresh('login-1', 'request-3', with_transactions=True)['Detail']
+
+        detail_calls = [
+            call for call in mocked_post.call_args_list
+            if call[0][0].endswith('/GetAccountsDetail')
+        ]
+        assert len(detail_calls) == 2
+        assert detail_calls[0][1]['json']['WithTransactions']
+        assert detector.stats() == {'fetched': 2, 'skipped': 1, 'avoided_ratio': 1 / 3}
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_fetches_account_details_when_the_detail_options_change(self, mocked_post, store):
+        def _post(url, json, **kwargs):
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            if url.endswith('/GetAccountsSummary'):
+                mocked_response.json.return_value = SUMMARY
+            else:
+                mocked_response.json.return_value = {'Accounts': [], 'Detail': True}
+            return mocked_response
+
+        mocked_post.side_effect = _post
+        detector = ChangeDetector(Client('foo-12345', 'https://username.flinks-custom.io'), store)
+
+        assert detector.refresh('login-1', 'request-1', with_transactions=False)['Detail']
+        assert detector.refresh('login-1', 'request-2', with_transactions=True)['Detail']
+        assert detector.refresh('login-1', 'request-3', with_transactions=True) is None
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_store_the_fingerprint_if_the_details_cannot_be_fetched(
+        self, mocked_post, store,
+    ):
+        def _post(url, json, **kwargs):
+            if url.endswith('/GetAccountsDetail'):
+                raise ConnectionError()
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            mocked_response.json.return_value = SUMMARY
+            return mocked_response
+
+        mocked_post.side_effect = _post
+        detector = ChangeDetector(Client('foo-12345', 'https://username.flinks-custom.io'), store)
+
+        with pytest.raises(ConnectionError):
+            detector.refresh('login-1', 'request-1')
+        assert store.get('login-1') is None
@@ -0,0 +1,211 @@
+import unittest.mock
+
+import pytest
+from requests.exceptions import ConnectionError, HTTPError
+
+from flinks import Client
+from flinks.circuitbreaker import CircuitBreaker, CircuitBreakerRegistry
+from flinks.exceptions import CircuitOpenError, ProtocolError, TransportError
+
+
+class TestCircuitBreaker:
+    def test_opens_after_the_configured_number_of_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+
+    def test_resets_the_failures_count_on_success(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_allows_a_limited_number_of_probes_once_the_recovery_timeout_has_elapsed(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 9
+        assert not breaker.allow_request()
+        clock.now = 10
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+    def test_closes_the_circuit_if_a_probe_succeeds(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_reopens_the_circuit_if_a_probe_fails(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=10, clock=clock)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now = 10
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 15
+        assert not breaker.allow_request()
+
+
+class TestCircuitBreakerRegistry:
+    def test_can_compute_the_keys_of_a_call_targetting_an_institution(self):
+        registry = CircuitBreakerRegistry()
+        assert registry.keys_for('BankingServices/Authorize', {'Institution': 'FooBank'}) == [
+            ('endpoint', 'BankingServices/Authorize'),
+            ('institution', 'FooBank'),
+        ]
+
+    def test_can_attribute_a_call_to_an_institution_using_a_known_request_id(self):
+        registry = CircuitBreakerRegistry()
+        registry.remember_institution('request-1234', 'FooBank')
+        keys = registry.keys_for('BankingServices/GetAccountsDetail', {'RequestId': 'request-1234'})
+        assert keys == [
+            ('endpoint', 'BankingServices/GetAccountsDetail'), ('institution', 'FooBank'),
+        ]
+        assert registry.keys_for('BankingServices/GetAccountsDetailAsync/request-1234') == [
+            ('endpoint', 'BankingServices/GetAccountsDetailAsync'), ('institution', 'FooBank'),
+        ]
+
+    def test_forgets_the_oldest_known_request_ids(self):
+        registry = CircuitBreakerRegistry(max_known_requests=1)
+        registry.remember_institution('request-1', 'FooBank')
+        registry.remember_institution('request-2', 'BarBank')
+        assert registry.keys_for('BankingServices/GetAccountsDetail', {'RequestId': 'request-1'}) \
+            == [('endpoint', 'BankingServices/GetAccountsDetail')]
+
+    def test_releases_granted_probes_if_another_circuit_is_open(self, clock):
+        registry = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=10, clock=clock)
+        registry.get('endpoint', 'BankingServices/Authorize').record_failure()
+        clock.now = 10
+        registry.get('institution', 'FooBank').record_failure()
+        keys = [('endpoint', 'BankingServices/Authorize'), ('institution', 'FooBank')]
+        with pytest.raises(CircuitOpenError):
+            registry.before_call(keys)
+        assert registry.get('endpoint', 'BankingServices/Authorize').allow_request()
+
+    def test_can_return_the_state_of_all_the_known_circuits(self):
+        registry = CircuitBreakerRegistry(failure_threshold=1)
+        registry.record([('institution', 'FooBank')], success=False)
+        registry.record([('institution', 'BarBank')], success=True)
+        assert registry.states() == {
+            ('institution', 'FooBank'): 'open',
+            ('institution', 'BarBank'): 'closed',
+        }
+        registry.reset()
+        assert registry.states()[('institution', 'FooBank')] == 'closed'
+
+
+class TestClientWithCircuitBreakers:
+    @unittest.mock.patch('requests.Session.post')
+    def test_fails_fast_when_an_institution_is_known_to_be_failing(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=503, content='ERROR')
+        mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_post.return_value = mocked_response
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            circuit_breakers=CircuitBreakerRegistry(failure_threshold=2),
+        )
+        for _ in range(2):
+            with pytest.raises(TransportError):
+                client.banking_services.authorize(institution='FooBank', username='u', password='p')
+        with pytest.raises(CircuitOpenError):
+            client.banking_services.authorize(institution='FooBank', username='u', password='p')
+        assert mocked_post.call_count == 2
+        assert client.circuit_breakers.states()[('institution', 'FooBank')] == 'open'
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_counts_connection_errors_as_failures(self, mocked_post):
+        mocked_post.side_effect = ConnectionError()
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            circuit_breakers=CircuitBreakerRegistry(failure_threshold=1),
+        )
+        with pytest.raises(ConnectionError):
+            client.banking_services.get_accounts_summary('request-1234')
+        with pytest.raises(CircuitOpenError):
+            client.banking_services.get_accounts_summary('request-1234')
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_count_flinks_errors_as_failures(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=400, content='{}')
+        mocked_response.json.return_value = {'FlinksCode': 'INVALID_LOGIN'}
+        mocked_post.return_value = mocked_response
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            circuit_breakers=CircuitBreakerRegistry(failure_threshold=1),
+        )
+        for _ in range(2):
+            with pytest.raises(ProtocolError):
+                client.banking_services.authorize(login_id='test', institution='FooBank')
+        assert mocked_post.call_count == 2
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_attributes_detail_calls_to_the_institution_of_the_authorized_request(
+        self, mocked_post,
+    ):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = {
+            'RequestId': 'request-1234', 'Login': {'Id': 'login-1234'}, 'Institution': 'FooBank',
+        }
+        mocked_post.return_value = mocked_response
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            circuit_breakers=CircuitBreakerRegistry(failure_threshold=1),
+        )
+        client.banking_services.authorize(login_id='login-1234')
+        client.circuit_breakers.get('institution', 'FooBank').record_failure()
+        with pytest.raises(CircuitOpenError):
+            client.banking_services.get_accounts_detail('request-1234')
+        assert mocked_post.call_count == 1
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_block_healthy_institutions_when_another_one_is_failing(self, mocked_post):
+        def post(url, params=None, json=None):
+            status_code = 503 if json['RequestId'] == 'request-dead' else 200
+            response = unittest.mock.Mock(status_code=status_code, content='{}')
+            if status_code == 503:
+                response.raise_for_status.side_effect = HTTPError(response=response)
+            response.json.return_value = {'Accounts': []}
+            return response
+
+        mocked_post.side_effect = post
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            circuit_breakers=CircuitBreakerRegistry(failure_threshold=2),
+        )
+        client.circuit_breakers.remember_institution('request-dead', 'DeadBank')
+        client.circuit_breakers.remember_institution('request-good', 'GoodBank')
+        for _ in range(5):
+            with pytest.raises((TransportError, CircuitOpenError)):
+                client.banking_services.get_accounts_detail('request-dead')
+        assert client.banking_services.get_accounts_detail('request-good') == {'Accounts': []}
+        states = client.circuit_breakers.states()
+        assert states[('institution', 'DeadBank')] == 'open'
+        assert states[('endpoint', 'BankingServices/GetAccountsDetail')] == 'closed'
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_releases_the_probe_slot_when_the_call_fails_for_an_unrelated_reason(
+        self, mocked_post, clock,
+    ):
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            circuit_breakers=CircuitBreakerRegistry(
+                failure_threshold=1, recovery_timeout=10, clock=clock,
+            ),
+        )
+        breaker = client.circuit_breakers.get('endpoint', 'BankingServices/GetAccountsSummary')
+        breaker.record_failure()
+        clock.now = 10
+        mocked_post.side_effect = TypeError('Object of type set is not JSON serializable')
+        with pytest.raises(TypeError):
+            client.banking_services.get_accounts_summary('request-1234')
+        assert breaker.state == 'half-open'
+        assert breaker.allow_request()
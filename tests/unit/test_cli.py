@@ -0,0 +1,120 @@
+import io
+import json
+import unittest.mock
+
+from requests.exceptions import HTTPError
+
+from flinks import Client
+from flinks.archive import TransactionArchive
+from flinks.cli import main
+
+
+def _post(url, json, **kwargs):
+    mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+    if url.endswith('/Authorize'):
+        if json['LoginId'] == 'login-bad':
+            mocked_response.status_code = 500
+            mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_response.json.return_value = {
+            'HttpStatusCode': 200, 'RequestId': 'request-' + json['LoginId'],
+        }
+    else:
+        mocked_response.json.return_value = {
+            'Accounts': [
+                {
+                    'Id': 'acc-1',
+                    'Transactions': [
+                        {'Id': 'tx-1', 'Date': '2017-01-01', 'Description': 'Coffee', 'Debit': 2},
+                    ],
+                },
+            ],
+        }
+    return mocked_response
+
+
+class TestCli:
+    @unittest.mock.patch('requests.Session.post', side_effect=_post)
+    def test_can_export_account_details_as_ndjson(self, mocked_post, tmpdir):
+        input_path = tmpdir.join('logins.txt')
+        input_path.write('login-1\nlogin-2\n\n')
+        output_path = tmpdir.join('output.ndjson')
+
+        status = main([
+            str(input_path), '-o', str(output_path), '--customer-id', 'foo-12345', '-j', '2',
+        ])
+
+        assert status == 0
+        records = [json.loads(line) for line in output_path.readlines()]
+        assert sorted(record['Id'] for record in records) == ['login-1', 'login-2']
+        assert records[0]['Response']['Accounts'][0]['Id'] == 'acc-1'
+        assert mocked_post.call_count == 4
+
+    @unittest.mock.patch('requests.Session.post', side_effect=_post)
+    def test_sizes_the_connection_pool_according_to_the_parallelism(self, mocked_post, tmpdir):
+        input_path = tmpdir.join('logins.txt')
+        input_path.write('login-1\n')
+
+        with unittest.mock.patch('flinks.cli.Client', wraps=Client) as mocked_client:
+            status = main([
+                str(input_path), '-o', str(tmpdir.join('output.ndjson')),
+                '--customer-id', 'foo-12345', '-j', '16',
+            ])
+
+        assert status == 0
+        assert mocked_client.call_args[1]['http_pool_size'] == 16
+
+    @unittest.mock.patch('requests.Session.post', side_effect=_post)
+    def test_can_export_account_details_for_request_ids(self, mocked_post, tmpdir):
+        output_path = tmpdir.join('output.ndjson')
+
+        with unittest.mock.patch('sys.stdin', io.StringIO('request-1\n')):
+            status = main([
+                '-o', str(output_path), '--customer-id', 'foo-12345', '--input-type', 'request',
+            ])
+
+        assert status == 0
+        assert mocked_post.call_count == 1
+        assert mocked_post.call_args[1]['json']['RequestId'] == 'request-1'
+
+    @unittest.mock.patch('requests.Session.post', side_effect=_post)
+    def test_can_resume_an_export_using_a_checkpoint(self, mocked_post, tmpdir):
+        input_path = tmpdir.join('logins.txt')
+        input_path.write('login-1\nlogin-bad\nlogin-2\n')
+        output_path = tmpdir.join('output.ndjson')
+        checkpoint_path = tmpdir.join('checkpoint.txt')
+        checkpoint_path.write('login-1\n')
+        args = [
+            str(input_path), '-o', str(output_path), '--customer-id', 'foo-12345',
+            '--checkpoint', str(checkpoint_path),
+        ]
+
+        assert main(args) == 1
+
+        assert sorted(checkpoint_path.read().split()) == ['login-1', 'login-2']
+        assert [json.loads(line)['Id'] for line in output_path.readlines()] == ['login-2']
+        assert 'request-login-1' not in [
+            call[1]['json'].get('RequestId') for call in mocked_post.call_args_list
+        ]
+
+    @unittest.mock.patch('requests.Session.post', side_effect=_post)
+    def test_can_export_transactions_as_archive_parts(self, mocked_post, tmpdir):
+        input_path = tmpdir.join('logins.txt')
+        input_path.write('login-1\nlogin-2\nlogin-3\n')
+        output_dir = tmpdir.join('archives')
+
+        status = main([
+            str(input_path), '-o', str(output_dir), '--format', 'archive', '--batch-size', '2',
+            '--customer-id', 'foo-12345',
+        ])
+
+        assert status == 0
+        assert sorted(p.basename for p in output_dir.listdir()) == [
+            'part-00000.flka', 'part-00001.flka',
+        ]
+        with TransactionArchive(str(output_dir.join('part-00000.flka'))) as archive:
+            assert len(archive) == 2
+            assert archive.string(archive.logins[0]).startswith('login-')
+
+    def test_requires_a_customer_id(self, monkeypatch):
+        monkeypatch.delenv('FLINKS_CUSTOMER_ID', raising=False)
+        assert main(['logins.txt']) == 2
@@ -0,0 +1,174 @@
+import threading
+import time
+import unittest.mock
+
+import pytest
+
+from flinks import Client
+from flinks.hedging import HedgingPolicy
+from flinks.scheduler import RequestScheduler
+
+
+ENDPOINT = 'BankingServices/GetAccountsSummary'
+
+
+class TestHedgingPolicy:
+    def test_does_not_hedge_calls_to_non_eligible_endpoints(self):
+        policy = HedgingPolicy(initial_delay=0)
+        assert policy.call('BankingServices/Authorize', lambda: 42) == 42
+        assert policy.stats()['calls'] == 0
+
+    def test_does_not_hedge_fast_calls(self):
+        policy = HedgingPolicy(initial_delay=1)
+        assert policy.call(ENDPOINT, lambda: 42) == 42
+        stats = policy.stats()
+        assert stats['calls'] == 1
+        assert stats['hedged'] == 0
+        policy.shutdown()
+
+    def test_uses_the_response_of_the_duplicate_request_if_it_arrives_first(self):
+        policy = HedgingPolicy(initial_delay=0.01, budget=1)
+        release_primary = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(None)
+            if len(calls) == 1:
+                release_primary.wait(5)
+                return 'primary'
+            return 'hedge'
+
+        assert policy.call(ENDPOINT, func) == 'hedge'
+        release_primary.set()
+        stats = policy.stats()
+        assert stats['hedged'] == 1
+        assert stats['hedge_wins'] == 1
+        policy.shutdown()
+
+    def test_falls_back_to_the_other_request_if_one_of_them_fails(self):
+        policy = HedgingPolicy(initial_delay=0.01, budget=1)
+        release_primary = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(None)
+            if len(calls) == 1:
+                release_primary.wait(5)
+                return 'primary'
+            release_primary.set()
+            raise ValueError()
+
+        assert policy.call(ENDPOINT, func) == 'primary'
+        assert policy.stats()['primary_wins'] == 1
+        policy.shutdown()
+
+    def test_raises_if_all_the_requests_fail(self):
+        policy = HedgingPolicy(initial_delay=0.01, budget=1)
+        barrier = threading.Barrier(2)
+
+        def func():
+            barrier.wait(5)
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            policy.call(ENDPOINT, func)
+        policy.shutdown()
+
+    def test_does_not_hedge_calls_if_the_budget_is_exhausted(self):
+        policy = HedgingPolicy(initial_delay=0.01, budget=0.5)
+        event = threading.Event()
+        threading.Timer(0.05, event.set).start()
+        assert policy.call(ENDPOINT, lambda: event.wait(5)) is True
+        stats = policy.stats()
+        assert stats['hedged'] == 0
+        assert stats['budget_exhausted'] == 1
+        policy.shutdown()
+
+    def test_does_not_limit_the_number_of_concurrent_calls(self):
+        policy = HedgingPolicy(initial_delay=0.5, budget=1)
+        barrier = threading.Barrier(30)
+
+        def func():
+            barrier.wait(5)
+            return 42
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(policy.call(ENDPOINT, func)))
+            for _ in range(30)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == [42] * 30
+        assert policy.stats()['hedged'] == 0
+        policy.shutdown()
+
+    def test_can_use_a_specific_callable_for_the_duplicate_request(self):
+        policy = HedgingPolicy(initial_delay=0.01, budget=1)
+        release_primary = threading.Event()
+        assert policy.call(
+            ENDPOINT, release_primary.wait, 5, hedge=lambda cancelled, timeout: 'hedge',
+        ) == 'hedge'
+        release_primary.set()
+        policy.shutdown()
+
+    def test_computes_the_hedging_delay_from_the_observed_latencies(self):
+        policy = HedgingPolicy(percentile=50, min_delay=0, min_samples=10)
+        for latency in range(1, 21):
+            policy._record_latency(latency)
+        assert policy.delay == 11
+
+
+class TestClientWithHedging:
+    @unittest.mock.patch('requests.Session.post')
+    def test_sends_requests_through_the_hedging_policy(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = {'Accounts': [], }
+        mocked_post.return_value = mocked_response
+
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io', hedging=HedgingPolicy(),
+        )
+        assert client.banking_services.get_accounts_summary('request-1234') == {'Accounts': []}
+        assert client.hedging.stats()['calls'] == 1
+        client.hedging.shutdown()
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_performs_duplicate_requests_in_their_own_scheduler_slot(self, mocked_post):
+        lock = threading.Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def post(url, params=None, json=None):
+            with lock:
+                in_flight.append(None)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.1)
+            with lock:
+                in_flight.pop()
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            mocked_response.json.return_value = {'Accounts': [], }
+            return mocked_response
+
+        mocked_post.side_effect = post
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            scheduler=RequestScheduler(max_concurrency=1),
+            hedging=HedgingPolicy(initial_delay=0.01, budget=1),
+        )
+        assert client.banking_services.get_accounts_summary('request-1234') == {'Accounts': []}
+        stats = client.hedging.stats()
+        assert stats['hedged'] == 1
+        assert stats['primary_wins'] == 1
+        # Waits for the duplicate request to acquire the slot released by the original call; it
+        # must not be sent since the original call already completed.
+        for _ in range(100):
+            if client.scheduler.active == 0 and client.scheduler.pending == 0:
+                break
+            time.sleep(0.01)
+        time.sleep(0.05)
+        assert mocked_post.call_count == 1
+        assert max(max_in_flight) == 1
+        client.hedging.shutdown()
@@ -0,0 +1,201 @@
+import multiprocessing
+import time
+import unittest.mock
+
+import pytest
+from requests.exceptions import HTTPError
+
+from flinks import Client
+from flinks.jobs import DEAD, DONE, LEASED, PENDING, JobQueue, Worker
+from flinks.scheduler import RequestScheduler
+
+
+@pytest.fixture
+def queue(tmpdir, clock):
+    return JobQueue(
+        str(tmpdir.join('jobs.sqlite3')), visibility_timeout=60, max_attempts=2, retry_delay=10,
+        clock=clock,
+    )
+
+
+def _lease_all(path, results):
+    queue = JobQueue(path)
+    while True:
+        job = queue.lease()
+        if job is None:
+            break
+        queue.complete(job)
+        results.put(job.id)
+
+
+class TestJobQueue:
+    def test_can_lease_and_complete_jobs(self, queue):
+        job_id = queue.put('get_accounts_summary', {'request_id': 'request-1234'})
+        job = queue.lease()
+        assert job.id == job_id
+        assert job.operation == 'get_accounts_summary'
+        assert job.payload == {'request_id': 'request-1234'}
+        assert job.attempts == 1
+        assert queue.lease() is None
+        assert queue.complete(job, {'Accounts': []})
+        assert queue.result(job_id) == {'Accounts': []}
+        assert queue.stats() == {PENDING: 0, LEASED: 0, DONE: 1, DEAD: 0}
+
+    def test_does_not_add_a_job_twice(self, queue):
+        queue.put('authorize', {'login_id': 'login-1'}, job_id='login-1')
+        queue.put('authorize', {'login_id': 'login-1'}, job_id='login-1')
+        assert queue.stats()[PENDING] == 1
+
+    def test_makes_jobs_visible_again_once_their_lease_expires(self, queue, clock):
+        queue.put('authorize', {'login_id': 'login-1'})
+        job = queue.lease()
+        clock.now += 60
+        leased_again = queue.lease()
+        assert leased_again.id == job.id
+        assert leased_again.attempts == 2
+        assert not queue.complete(job)
+        assert queue.complete(leased_again)
+
+    def test_can_extend_a_lease(self, queue, clock):
+        queue.put('authorize', {'login_id': 'login-1'})
+        job = queue.lease()
+        clock.now += 50
+        assert queue.extend(job)
+        clock.now += 50
+        assert queue.lease() is None
+
+    def test_retries_failed_jobs_after_a_delay_and_then_dead_letters_them(self, queue, clock):
+        queue.put('authorize', {'login_id': 'login-1'}, job_id='job-1')
+        queue.fail(queue.lease(), 'boom')
+        assert queue.lease() is None
+        clock.now += 10
+        queue.fail(queue.lease(), 'boom again')
+        clock.now += 1000
+        assert queue.lease() is None
+        dead_letters = queue.dead_letters()
+        assert [(job.id, error) for job, error in dead_letters] == [('job-1', 'boom again')]
+        assert queue.requeue_dead_letters() == 1
+        assert queue.lease().id == 'job-1'
+
+    def test_dead_letters_jobs_whose_last_lease_expired(self, queue, clock):
+        queue.put('authorize', {'login_id': 'login-1'})
+        queue.lease()
+        clock.now += 60
+        queue.lease()
+        clock.now += 60
+        assert queue.lease() is None
+        assert queue.stats()[DEAD] == 1
+
+    def test_can_be_shared_by_many_processes(self, tmpdir):
+        path = str(tmpdir.join('jobs.sqlite3'))
+        queue = JobQueue(path)
+        queue.put_many([('authorize', {'login_id': str(i)}, str(i)) for i in range(50)])
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_lease_all, args=(path, results)) for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        job_ids = [results.get(timeout=30) for _ in range(50)]
+        for process in processes:
+            process.join()
+
+        assert sorted(job_ids) == sorted(str(i) for i in range(50))
+        assert queue.stats()[DONE] == 50
+
+
+class TestWorker:
+    @unittest.mock.patch('requests.Session.post')
+    def test_can_perform_banking_services_operations(self, mocked_post, queue):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = {'Accounts': [], }
+        mocked_post.return_value = mocked_response
+        queue.put('get_accounts_summary', {'request_id': 'request-1234'}, job_id='job-1')
+        results = []
+
+        worker = Worker(
+            queue, Client('foo-12345', 'https://username.flinks-custom.io'), store_results=True,
+            on_result=lambda job, result: results.append((job.id, result)),
+        )
+        assert worker.run() == 1
+
+        assert results == [('job-1', {'Accounts': []})]
+        assert queue.result('job-1') == {'Accounts': []}
+        assert mocked_post.call_args[1]['json'] == {'RequestId': 'request-1234'}
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_retries_jobs_failing_because_of_transport_errors(self, mocked_post, queue):
+        mocked_response = unittest.mock.Mock(status_code=503, content='ERROR')
+        mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+        mocked_post.return_value = mocked_response
+        queue.put('get_accounts_summary', {'request_id': 'request-1234'})
+
+        Worker(queue, Client('foo-12345', 'https://username.flinks-custom.io')).run()
+
+        assert queue.stats()[PENDING] == 1
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_dead_letters_jobs_failing_because_of_flinks_errors(self, mocked_post, queue):
+        mocked_response = unittest.mock.Mock(status_code=400, content='{}')
+        mocked_response.json.return_value = {'FlinksCode': 'INVALID_LOGIN'}
+        mocked_post.return_value = mocked_response
+        queue.put('authorize', {'login_id': 'login-1'})
+        queue.put('_call', {})
+
+        Worker(queue, Client('foo-12345', 'https://username.flinks-custom.io')).run()
+
+        assert sorted(error for _, error in queue.dead_letters()) == [
+            'INVALID_LOGIN', 'Unknown operation: _call',
+        ]
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_dead_letters_jobs_with_invalid_payloads(self, mocked_post, queue):
+        queue.put('get_accounts_summary', {'request_ids': 'request-1234'})
+
+        Worker(queue, Client('foo-12345', 'https://username.flinks-custom.io')).run()
+
+        [(_, error)] = queue.dead_letters()
+        assert error.startswith('Invalid payload:')
+        assert not mocked_post.called
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_retries_jobs_failing_because_of_other_client_errors(self, mocked_post, queue):
+        queue.put('get_accounts_summary', {'request_id': 'request-1234'})
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            scheduler=RequestScheduler(clock=lambda: 10),
+        )
+
+        with client.scheduler.context(deadline=5):
+            Worker(queue, client).run()
+
+        assert queue.stats()[PENDING] == 1
+        assert not mocked_post.called
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_extends_the_lease_of_slow_jobs(self, mocked_post, queue, clock):
+        def _post(url, json, **kwargs):
+            clock.now += 50
+            time.sleep(0.1)
+            clock.now += 50
+            # The lease was extended while the job was being performed.
+            assert queue.lease() is None
+            mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+            mocked_response.json.return_value = {'Accounts': [], }
+            return mocked_response
+
+        mocked_post.side_effect = _post
+        queue.put('get_accounts_detail', {'request_id': 'request-1234'})
+
+        worker = Worker(
+            queue, Client('foo-12345', 'https://username.flinks-custom.io'),
+            heartbeat_interval=0.01,
+        )
+        assert worker.run() == 1
+        assert queue.stats()[DONE] == 1
+
+    def test_can_use_a_rollback_journal(self, tmpdir):
+        queue = JobQueue(str(tmpdir.join('jobs.sqlite3')), wal=False)
+        queue.put('get_accounts_summary', {'request_id': 'request-1234'})
+        assert queue.lease().operation == 'get_accounts_summary'
@@ -0,0 +1,88 @@
+from flinks.merge import TransactionIndex, merge_accounts_detail
+
+
+def _tx(transaction_id, date='2017-01-01', debit=2.5, description='Coffee'):
+    return {'Id': transaction_id, 'Date': date, 'Debit': debit, 'Description': description}
+
+
+class TestTransactionIndex:
+    def test_skips_transactions_whose_ids_are_known(self):
+        index = TransactionIndex()
+        assert index.merge('acc-1', [_tx('tx-1'), _tx('tx-2', date='2017-01-02')]) == [
+            _tx('tx-1'), _tx('tx-2', date='2017-01-02'),
+        ]
+        assert index.merge('acc-1', [_tx('tx-2', date='2017-01-02'), _tx('tx-3', debit=3)]) == [
+            _tx('tx-3', debit=3),
+        ]
+        assert len(index) == 3
+
+    def test_skips_transactions_returned_twice_by_the_same_fetch(self):
+        index = TransactionIndex()
+        assert index.merge('acc-1', [_tx('tx-1'), _tx('tx-1')]) == [_tx('tx-1')]
+        assert len(index) == 1
+        history = {'Accounts': []}
+        assert merge_accounts_detail(
+            history, {'Accounts': [{'Id': 'acc-1', 'Transactions': [_tx('tx-1'), _tx('tx-1')]}]},
+        ) == 1
+
+    def test_does_not_mix_transactions_of_different_accounts(self):
+        index = TransactionIndex()
+        index.merge('acc-1', [_tx('tx-1')])
+        assert index.merge('acc-2', [_tx('tx-1')]) == [_tx('tx-1')]
+
+    def test_keeps_new_identical_transactions_returned_by_delta_fetches(self):
+        index = TransactionIndex()
+        index.merge('acc-1', [_tx('tx-1')])
+        # A delta fetch only returns the second coffee bought the same day.
+        assert index.merge('acc-1', [_tx('tx-2')]) == [_tx('tx-2')]
+        assert len(index) == 2
+
+    def test_can_skip_transactions_whose_ids_changed_using_the_composite_key(self):
+        index = TransactionIndex(match_changed_ids=True)
+        index.merge('acc-1', [_tx('tx-1')])
+        assert index.merge('acc-1', [_tx('tx-1-new')]) == []
+        assert index.merge('acc-1', [_tx('tx-1-new')]) == []
+        assert len(index) == 1
+
+    def test_keeps_identical_transactions_that_are_not_in_the_history(self):
+        index = TransactionIndex(match_changed_ids=True)
+        index.merge('acc-1', [_tx('tx-1')])
+        # The first coffee is known; the second one (same day, same amount) is new.
+        assert index.merge('acc-1', [_tx('tx-2'), _tx('tx-1')]) == [_tx('tx-2')]
+        # IDs changed for both coffees and a third one was bought.
+        assert index.merge('acc-1', [_tx('a'), _tx('b'), _tx('c')]) == [_tx('c')]
+        assert len(index) == 3
+
+    def test_handles_transactions_without_ids(self):
+        index = TransactionIndex()
+        assert index.merge('acc-1', [{'Date': '2017-01-01', 'Credit': 10}]) == [
+            {'Date': '2017-01-01', 'Credit': 10},
+        ]
+        assert index.merge('acc-1', [{'Date': '2017-01-01', 'Credit': 10.0}]) == []
+
+
+class TestMergeAccountsDetail:
+    def test_can_fold_a_response_into_a_history(self):
+        history = {
+            'Accounts': [{'Id': 'acc-1', 'Title': 'Chequing', 'Transactions': [_tx('tx-1')]}],
+        }
+        response_data = {
+            'Accounts': [
+                {'Id': 'acc-1', 'Transactions': [_tx('tx-1'), _tx('tx-2', debit=4)]},
+                {'Id': 'acc-2', 'Title': 'Savings', 'Transactions': [_tx('tx-3')]},
+            ],
+        }
+
+        index = TransactionIndex.from_accounts_detail(history)
+        assert merge_accounts_detail(history, response_data, index) == 2
+        assert merge_accounts_detail(history, response_data, index) == 0
+
+        assert history == {
+            'Accounts': [
+                {
+                    'Id': 'acc-1', 'Title': 'Chequing',
+                    'Transactions': [_tx('tx-1'), _tx('tx-2', debit=4)],
+                },
+                {'Id': 'acc-2', 'Title': 'Savings', 'Transactions': [_tx('tx-3')]},
+            ],
+        }
@@ -0,0 +1,155 @@
+import unittest.mock
+
+from requests.exceptions import HTTPError
+
+from flinks import Client
+from flinks.mfa import AuthorizeFlow, MemoryAnswerStore, MfaDriver
+
+
+CHALLENGE_RESPONSE = {
+    'HttpStatusCode': 203,
+    'RequestId': 'request-1234',
+    'SecurityChallenges': [{'Type': 'QuestionAndAnswer', 'Prompt': 'What is your  city?'}],
+}
+AUTHORIZED_RESPONSE = {
+    'HttpStatusCode': 200,
+    'RequestId': 'request-1234',
+    'Login': {'Id': 'login-1234'},
+}
+
+
+def _mock_response(status_code, data):
+    mocked_response = unittest.mock.Mock(status_code=status_code, content='{}')
+    mocked_response.json.return_value = data
+    if status_code >= 400:
+        mocked_response.raise_for_status.side_effect = HTTPError(response=mocked_response)
+    return mocked_response
+
+
+def _client():
+    return Client('foo-12345', 'https://username.flinks-custom.io')
+
+
+class TestAuthorizeFlow:
+    @unittest.mock.patch('requests.Session.post')
+    def test_is_authorized_in_a_single_call_if_there_is_no_challenge(self, mocked_post):
+        mocked_post.return_value = _mock_response(200, AUTHORIZED_RESPONSE)
+        flow = AuthorizeFlow(_client(), login_id='login-1234').run()
+        assert flow.state == AuthorizeFlow.AUTHORIZED
+        assert flow.request_id == 'request-1234'
+        assert flow.calls == 1
+
+    @unittest.mock.patch('requests.Session.get')
+    @unittest.mock.patch('requests.Session.post')
+    def test_answers_challenges_using_the_answer_store(self, mocked_post, mocked_get):
+        mocked_post.side_effect = [
+            _mock_response(203, CHALLENGE_RESPONSE), _mock_response(200, AUTHORIZED_RESPONSE),
+        ]
+        answer_store = MemoryAnswerStore({'login-1234': {'What is your city?': 'Montreal'}})
+
+        flow = AuthorizeFlow(_client(), answer_store=answer_store, login_id='login-1234').run()
+
+        assert flow.state == AuthorizeFlow.AUTHORIZED
+        assert flow.calls == 2
+        assert not mocked_get.called
+        assert mocked_post.call_args[1]['json'] == {
+            'MostRecentCached': False,
+            'RequestId': 'request-1234',
+            'LoginId': 'login-1234',
+            'SecurityResponses': {'What is your  city?': ['Montreal']},
+        }
+
+    @unittest.mock.patch('requests.Session.get')
+    @unittest.mock.patch('requests.Session.post')
+    def test_retrieves_stored_answers_only_when_needed(self, mocked_post, mocked_get):
+        mocked_post.side_effect = [
+            _mock_response(203, CHALLENGE_RESPONSE), _mock_response(200, AUTHORIZED_RESPONSE),
+        ]
+        mocked_get.return_value = _mock_response(200, {
+            'Questions': [{'Question': 'What is your city?', 'Answer': 'Montreal'}],
+        })
+        answer_store = MemoryAnswerStore()
+
+        flow = AuthorizeFlow(_client(), answer_store=answer_store, login_id='login-1234').run()
+
+        assert flow.state == AuthorizeFlow.AUTHORIZED
+        assert flow.calls == 3
+        assert mocked_get.call_args[0][0].endswith('/GetMFAQuestions/login-1234')
+        assert answer_store.get('login-1234', 'what is your city?') == 'Montreal'
+
+    @unittest.mock.patch('requests.Session.get')
+    @unittest.mock.patch('requests.Session.post')
+    def test_fails_if_a_challenge_cannot_be_answered(self, mocked_post, mocked_get):
+        mocked_post.return_value = _mock_response(203, CHALLENGE_RESPONSE)
+        mocked_get.return_value = _mock_response(200, {'Questions': []})
+
+        flow = AuthorizeFlow(_client(), login_id='login-1234').run()
+
+        assert flow.state == AuthorizeFlow.FAILED
+        assert flow.challenges == CHALLENGE_RESPONSE['SecurityChallenges']
+        assert mocked_post.call_count == 1
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_fails_after_too_many_challenge_rounds(self, mocked_post):
+        mocked_post.return_value = _mock_response(203, CHALLENGE_RESPONSE)
+        answer_store = MemoryAnswerStore({'login-1234': {'What is your city?': 'Montreal'}})
+
+        flow = AuthorizeFlow(
+            _client(), answer_store=answer_store, max_rounds=2, login_id='login-1234',
+        ).run()
+
+        assert flow.state == AuthorizeFlow.FAILED
+        assert mocked_post.call_count == 3
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_retries_calls_failing_because_of_transient_errors_only(self, mocked_post):
+        mocked_post.side_effect = [
+            _mock_response(503, {}), _mock_response(200, AUTHORIZED_RESPONSE),
+        ]
+        flow = AuthorizeFlow(_client(), login_id='login-1234').run()
+        assert flow.state == AuthorizeFlow.AUTHORIZED
+        assert flow.calls == 2
+
+        mocked_post.side_effect = [_mock_response(401, {})]
+        flow = AuthorizeFlow(_client(), login_id='login-1234').run()
+        assert flow.state == AuthorizeFlow.FAILED
+        assert flow.calls == 1
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_retry_calls_carrying_credentials_or_security_responses(self, mocked_post):
+        mocked_post.side_effect = [_mock_response(503, {})]
+        flow = AuthorizeFlow(
+            _client(), institution='FooBank', username='user', password='pass',
+        ).run()
+        assert flow.state == AuthorizeFlow.FAILED
+        assert flow.calls == 1
+
+        mocked_post.side_effect = [
+            _mock_response(203, CHALLENGE_RESPONSE), _mock_response(503, {}),
+        ]
+        answer_store = MemoryAnswerStore({'login-1234': {'What is your city?': 'Montreal'}})
+        flow = AuthorizeFlow(_client(), answer_store=answer_store, login_id='login-1234').run()
+        assert flow.state == AuthorizeFlow.FAILED
+        assert flow.calls == 2
+        assert flow.error.response.status_code == 503
+
+
+class TestMfaDriver:
+    @unittest.mock.patch('requests.Session.post')
+    def test_can_run_many_flows_concurrently(self, mocked_post):
+        def _post(url, json, **kwargs):
+            if json.get('SecurityResponses') or json['LoginId'] == 'login-1':
+                return _mock_response(200, dict(AUTHORIZED_RESPONSE, RequestId=json['LoginId']))
+            return _mock_response(203, dict(CHALLENGE_RESPONSE, RequestId=json['LoginId']))
+
+        mocked_post.side_effect = _post
+        answer_store = MemoryAnswerStore({'login-2': {'What is your city?': 'Montreal'}})
+
+        flows = MfaDriver(_client(), answer_store=answer_store, max_workers=2).run([
+            {'login_id': 'login-1', 'most_recent_cached': True},
+            {'login_id': 'login-2', 'most_recent_cached': True},
+        ])
+
+        assert [flow.state for flow in flows] == [AuthorizeFlow.AUTHORIZED] * 2
+        assert [flow.request_id for flow in flows] == ['login-1', 'login-2']
+        assert [flow.calls for flow in flows] == [1, 2]
@@ -0,0 +1,113 @@
+import time
+import tracemalloc
+import unittest.mock
+
+import pytest
+
+from flinks import Client
+from flinks.profiling import Profiler
+
+
+class TestProfiler:
+    def test_records_statistics_per_endpoint_and_response_size(self):
+        profiler = Profiler()
+        for size in (10, 12, 3000):
+            with profiler.record('BankingServices/GetAccountsDetail') as call:
+                call['response_size'] = size
+        with profiler.record('BankingServices/Authorize'):
+            pass
+
+        summary = profiler.summary()
+        assert [(s['endpoint'], s['response_size'], s['calls']) for s in summary] == [
+            ('BankingServices/Authorize', 0, 1),
+            ('BankingServices/GetAccountsDetail', 16, 2),
+            ('BankingServices/GetAccountsDetail', 4096, 1),
+        ]
+        assert summary[1]['wall'] >= summary[1]['wall_max'] >= 0
+        assert 'BankingServices/GetAccountsDetail' in profiler.report()
+
+    def test_can_record_the_allocated_memory(self):
+        profiler = Profiler(trace_memory=True)
+        try:
+            with profiler.record('BankingServices/GetAccountsDetail'):
+                data = [bytearray(1024) for _ in range(100)]
+            assert profiler.summary()[0]['memory'] >= 100 * 1024
+            assert data
+        finally:
+            profiler.stop()
+
+    @pytest.mark.skipif(not hasattr(tracemalloc, 'reset_peak'), reason='requires Python 3.9+')
+    def test_records_the_peak_memory_allocated_by_calls(self):
+        profiler = Profiler(trace_memory=True)
+        try:
+            with profiler.record('BankingServices/GetAccountsDetail'):
+                data = [bytearray(1024) for _ in range(1000)]
+                del data
+            assert profiler.memory_metric == 'peak'
+            assert profiler.summary()[0]['memory'] >= 1000 * 1024
+            assert 'peak avg' in profiler.report()
+        finally:
+            profiler.stop()
+
+    def test_stops_tracing_memory_once_the_memory_window_has_elapsed(self):
+        clock = unittest.mock.Mock(return_value=0)
+        profiler = Profiler(trace_memory=True, memory_window=10, clock=clock)
+        try:
+            with profiler.record('BankingServices/GetAccountsDetail'):
+                pass
+            assert tracemalloc.is_tracing()
+            clock.return_value = 10
+            with profiler.record('BankingServices/GetAccountsDetail'):
+                pass
+            assert not tracemalloc.is_tracing()
+            assert not profiler.trace_memory
+        finally:
+            profiler.stop()
+
+    def test_does_not_stop_tracing_memory_if_it_was_started_elsewhere(self):
+        tracemalloc.start()
+        try:
+            Profiler(trace_memory=True).stop()
+            assert tracemalloc.is_tracing()
+        finally:
+            tracemalloc.stop()
+
+    def test_can_profile_a_fraction_of_the_calls(self):
+        with unittest.mock.patch('random.random', return_value=0.5):
+            assert Profiler(sample_rate=0.6).should_sample()
+            assert not Profiler(sample_rate=0.4).should_sample()
+
+    def test_can_dump_sampled_stacks_using_the_collapsed_format(self, tmpdir):
+        profiler = Profiler(stack_interval=0.001)
+        try:
+            with profiler.record('BankingServices/GetAccountsDetail'):
+                deadline = time.monotonic() + 5
+                while not profiler.stacks and time.monotonic() < deadline:
+                    time.sleep(0.001)
+        finally:
+            profiler.stop()
+
+        path = tmpdir.join('stacks.txt')
+        profiler.dump_stacks(str(path))
+        line = path.readlines()[0]
+        stack, count = line.rsplit(' ', 1)
+        assert stack.startswith('BankingServices/GetAccountsDetail;')
+        assert 'test_can_dump_sampled_stacks_using_the_collapsed_format' in stack
+        assert int(count) >= 1
+
+
+class TestClientWithProfiler:
+    @unittest.mock.patch('requests.Session.post')
+    def test_profiles_calls(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{"Accounts": []}')
+        mocked_response.json.return_value = {'Accounts': [], }
+        mocked_post.return_value = mocked_response
+
+        client = Client('foo-12345', 'https://username.flinks-custom.io', profiler=Profiler())
+        client.banking_services.get_accounts_summary('request-1234')
+
+        summary = client.profiler.summary()
+        assert len(summary) == 1
+        assert summary[0]['endpoint'] == 'BankingServices/GetAccountsSummary'
+        assert summary[0]['response_size'] == 16
+        assert summary[0]['calls'] == 1
@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest.mock
+
+import pytest
+
+from flinks import Client
+from flinks.exceptions import DeadlineExceededError
+from flinks.scheduler import RequestScheduler
+
+
+class TestRequestScheduler:
+    def test_admits_calls_immediately_if_a_slot_is_available(self):
+        scheduler = RequestScheduler(max_concurrency=2)
+        with scheduler.slot():
+            assert scheduler.active == 1
+            with scheduler.slot():
+                assert scheduler.active == 2
+        assert scheduler.active == 0
+
+    def test_drops_calls_whose_deadline_has_already_passed(self):
+        scheduler = RequestScheduler(clock=lambda: 100)
+        with pytest.raises(DeadlineExceededError):
+            with scheduler.slot(deadline=99):
+                pass  # pragma: no cover
+        assert scheduler.dropped == 1
+        assert scheduler.active == 0
+
+    def test_drops_calls_whose_deadline_passes_while_waiting(self):
+        scheduler = RequestScheduler(max_concurrency=1)
+        with scheduler.slot():
+            with pytest.raises(DeadlineExceededError):
+                with scheduler.context(timeout=0.05):
+                    scheduler.acquire()
+            assert scheduler.pending == 0
+        assert scheduler.active == 0
+
+    def test_admits_pending_calls_by_priority(self):
+        scheduler = RequestScheduler(max_concurrency=1)
+        admitted = []
+
+        def worker(name, priority):
+            with scheduler.slot(priority=priority):
+                admitted.append(name)
+
+        scheduler.acquire()
+        threads = []
+        for name, priority in (('low', RequestScheduler.LOW), ('high', RequestScheduler.HIGH)):
+            thread = threading.Thread(target=worker, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            while scheduler.pending < len(threads):
+                time.sleep(0.001)
+        scheduler.release()
+        for thread in threads:
+            thread.join()
+
+        assert admitted == ['high', 'low']
+
+    def test_context_settings_can_be_nested(self):
+        scheduler = RequestScheduler(clock=lambda: 0)
+        with scheduler.context(priority=RequestScheduler.HIGH, deadline=10):
+            with scheduler.context(deadline=5):
+                assert scheduler._local.settings == (RequestScheduler.HIGH, 5)
+            assert scheduler._local.settings == (RequestScheduler.HIGH, 10)
+        assert scheduler._local.settings == (RequestScheduler.NORMAL, None)
+
+
+class TestClientWithScheduler:
+    @unittest.mock.patch('requests.Session.post')
+    def test_does_not_send_requests_whose_deadline_has_passed(self, mocked_post):
+        clock = unittest.mock.Mock(return_value=100)
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io',
+            scheduler=RequestScheduler(clock=clock),
+        )
+        with client.scheduler.context(deadline=50):
+            with pytest.raises(DeadlineExceededError):
+                client.banking_services.get_accounts_summary('request-1234')
+        assert not mocked_post.called
+
+    @unittest.mock.patch('requests.Session.post')
+    def test_sends_requests_through_the_scheduler(self, mocked_post):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = {'Accounts': [], }
+        mocked_post.return_value = mocked_response
+        client = Client(
+            'foo-12345', 'https://username.flinks-custom.io', scheduler=RequestScheduler(),
+        )
+        with client.scheduler.context(priority=RequestScheduler.HIGH, timeout=10):
+            assert client.banking_services.get_accounts_summary('request-1234') == {
+                'Accounts': [],
+            }
+        assert client.scheduler.active == 0
@@ -0,0 +1,96 @@
+import unittest.mock
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from flinks import Client
+from flinks.session import Session
+
+
+class StubAdapter(HTTPAdapter):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request, kwargs))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"Accounts": []}'
+        response.request = request
+        response.url = request.url
+        return response
+
+
+class TestSession:
+    def test_can_send_requests_using_the_session_settings(self):
+        adapter = StubAdapter()
+        session = Session()
+        session.headers['X-Test'] = 'foo'
+        session.params['param'] = '1'
+        session.mount('https://', adapter)
+
+        response = session.post(
+            'https://example.com/foo', json={'RequestId': 'bar'}, headers={'X-Other': 'bar'},
+        )
+
+        assert response.json() == {'Accounts': []}
+        request, send_kwargs = adapter.requests[0]
+        assert request.method == 'POST'
+        assert request.url == 'https://example.com/foo?param=1'
+        assert request.headers['X-Test'] == 'foo'
+        assert request.headers['X-Other'] == 'bar'
+        assert request.headers['Content-Type'] == 'application/json'
+        assert request.body == b'{"RequestId": "bar"}'
+        assert 'verify' in send_kwargs
+
+    def test_computes_environment_settings_once_per_host(self):
+        session = Session()
+        session.mount('https://', StubAdapter())
+        with unittest.mock.patch.object(
+            session, 'merge_environment_settings', wraps=session.merge_environment_settings,
+        ) as mocked_merge:
+            for _ in range(3):
+                session.get('https://example.com/foo')
+            session.get('https://example.org/foo')
+        assert mocked_merge.call_count == 2
+
+    def test_applies_session_settings_changed_after_a_request(self):
+        adapter = StubAdapter()
+        session = Session()
+        session.mount('https://', adapter)
+        session.get('https://example.com/foo')
+
+        session.proxies = {'https': 'http://proxy.example.com:3128'}
+        session.cert = '/path/to/client.pem'
+        session.get('https://example.com/foo')
+
+        send_kwargs = adapter.requests[1][1]
+        assert send_kwargs['proxies']['https'] == 'http://proxy.example.com:3128'
+        assert send_kwargs['cert'] == '/path/to/client.pem'
+
+    def test_falls_back_to_the_default_implementation_for_unsupported_options(self):
+        session = Session()
+        session.mount('https://', StubAdapter())
+        with unittest.mock.patch('requests.Session.request') as mocked_request:
+            session.get('https://example.com/foo', verify=False)
+            session.cookies.set('foo', 'bar')
+            session.get('https://example.com/foo')
+        assert mocked_request.call_count == 2
+
+
+class TestClientSession:
+    def test_sends_the_default_headers(self):
+        adapter = StubAdapter()
+        client = Client('foo-12345', 'https://username.flinks-custom.io')
+        client.session.mount(client.api_endpoint, adapter)
+
+        client.banking_services.get_accounts_detail_async('request-1234')
+
+        request = adapter.requests[0][0]
+        assert request.url == (
+            'https://username.flinks-custom.io/foo-12345/BankingServices/'
+            'GetAccountsDetailAsync/request-1234'
+        )
+        assert request.headers['cache-control'] == 'no-cache'
+        assert request.headers['Content-Type'] == 'application/json'
@@ -0,0 +1,143 @@
+import datetime as dt
+import json
+import threading
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+import requests
+
+from flinks import Client
+from flinks.hedging import HedgingPolicy
+from flinks.session import Session
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        self._respond({'RequestId': data['RequestId'], 'Path': self.path})
+
+    def do_GET(self):
+        self._respond({'Path': self.path})
+
+    def _respond(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}/'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def _hammer(client, threads=32, calls=10):
+    errors = []
+    entities = set()
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        try:
+            barrier.wait(10)
+            entities.add(id(client.banking_services))
+            for call in range(calls):
+                request_id = 'request-{}-{}'.format(index, call)
+                if call % 2:
+                    response_data = client.banking_services.get_accounts_summary(request_id)
+                    assert response_data['RequestId'] == request_id
+                else:
+                    response_data = client.banking_services.get_accounts_detail_async(request_id)
+                    assert response_data['Path'].endswith('/' + request_id)
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(i, )) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return errors, entities
+
+
+class TestThreadSafety:
+    def test_a_shared_client_can_be_used_by_many_threads(self, server_url):
+        client = Client('foo-12345', server_url, http_pool_size=32)
+        errors, entities = _hammer(client)
+        assert errors == []
+        assert len(entities) == 1
+
+    def test_a_client_with_thread_local_sessions_can_be_used_by_many_threads(self, server_url):
+        client = Client('foo-12345', server_url, http_pool_size=32, thread_local_sessions=True)
+        errors, entities = _hammer(client)
+        assert errors == []
+        assert len(entities) == 1
+
+    def test_thread_local_sessions_share_the_same_connection_pool(self):
+        client = Client('foo-12345', thread_local_sessions=True)
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(client.session))
+        thread.start()
+        thread.join()
+        assert isinstance(client.session, Session)
+        assert client.session is client.session
+        assert sessions[0] is not client.session
+        assert (
+            sessions[0].get_adapter(client.api_endpoint) is
+            client.session.get_adapter(client.api_endpoint)
+        )
+
+    def test_can_replace_the_http_session(self):
+        client = Client('foo-12345')
+        session = requests.Session()
+        client.session = session
+        assert client.session is session
+        assert session.headers['cache-control'] == 'no-cache'
+
+    def test_can_configure_every_created_session_using_a_hook(self):
+        def hook(session):
+            session.proxies['https'] = 'http://proxy.example.com:3128'
+
+        client = Client('foo-12345', thread_local_sessions=True, session_hook=hook)
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(client.session))
+        thread.start()
+        thread.join()
+        assert sessions[0].proxies['https'] == 'http://proxy.example.com:3128'
+        assert client.session.proxies['https'] == 'http://proxy.example.com:3128'
+
+    def test_uses_the_session_of_the_calling_thread_for_hedged_and_windowed_calls(self):
+        mocked_response = unittest.mock.Mock(status_code=200, content='{}')
+        mocked_response.json.return_value = {'Accounts': []}
+        session = requests.Session()
+        session.post = unittest.mock.Mock(return_value=mocked_response)
+        client = Client(
+            'foo-12345', thread_local_sessions=True, hedging=HedgingPolicy(initial_delay=5),
+        )
+        client.session = session
+
+        client.banking_services.get_accounts_summary('request-1234')
+        list(client.banking_services.iter_accounts_detail_windows(
+            'request-1234', dt.date(2017, 1, 1), dt.date(2017, 1, 21), window_days=7,
+        ))
+
+        assert session.post.call_count == 4
+        assert client.session is session
+        client.hedging.shutdown()